@@ -1,23 +1,44 @@
 import streamlit as st
-import requests
-import wikipediaapi
-from openai import OpenAI
-from elevenlabs.client import ElevenLabs
-from elevenlabs import save
-import os
-import json
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-import folium
-from streamlit_folium import st_folium
-import tempfile
+import time
+import uuid
 from streamlit_geolocation import streamlit_geolocation
+from steepd import artifact_cache, city_pack, clients, http_clients, map_view, narration, places, poi_index
+from steepd import prefetch, stories, story_pipeline, telemetry, wiki_resolver
+from steepd.content_store import place_key
 
-# Load environment variables
+# The place, story and narration logic lives in the steepd package; this file
+# is the Streamlit frontend on top of it. Provider SDKs and the map libraries
+# are imported on first use, so the page comes up without waiting for them.
 
 # Initialize APIs
-openai_client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-
+# API clients are created on first use, once per process, and shared by every
+# session and worker thread, so connections stay open between requests
+clients.configure(
+    openai_api_key=st.secrets["OPENAI_API_KEY"],
+    openai_base_url=st.secrets.get("OPENAI_BASE_URL"),  # e.g. tools/fake_openai.py
+    elevenlabs_api_key=st.secrets["ELEVENLABS_API_KEY"],
+    elevenlabs_base_url=st.secrets.get("ELEVENLABS_BASE_URL")  # e.g. tools/stub_upstreams.py
+)
+
+# Incremental refresh while walking: moves shorter than RERANK_DISTANCE are
+# treated as GPS jitter, and new candidate tiles are fetched with REFETCH_MARGIN
+# to spare so the next fetch waits until the walker has moved on
+SEARCH_RADIUS = places.SEARCH_RADIUS  # metres
+RERANK_DISTANCE = 25
+REFETCH_MARGIN = 500
+MAX_SESSION_TILES = 64
+
+# Predictive prefetch of stories for places ahead of the walker
+PREFETCH_TOP_N = 2  # Upcoming places warmed per location update
+PREFETCH_WORKERS = 2  # Concurrent warm-ups across all sessions
+PREFETCH_BUDGET = 6  # Warm-ups started per session within PREFETCH_WINDOW
+PREFETCH_WINDOW = 600  # seconds
+MAX_LOCATION_FIXES = 20
+
+# Selected stories are fetched, written and narrated by a background pipeline
+# that the Story column polls; stage deadlines are set in steepd.stories
+PIPELINE_WORKERS = 8
+POLL_INTERVAL = 0.5  # seconds between status checks while a story is on its way
 
 
 st.set_page_config(page_title="Steepd", layout="wide")
@@ -37,358 +58,286 @@ if 'use_browser_location' not in st.session_state:
     st.session_state.use_browser_location = True
 if 'manual_override' not in st.session_state:
     st.session_state.manual_override = False
+if 'story_job' not in st.session_state:
+    st.session_state.story_job = None
+if 'story_audio' not in st.session_state:
+    st.session_state.story_audio = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'data_saver' not in st.session_state:
+    # Phones default to the smaller narration format
+    user_agent = st.context.headers.get('User-Agent', '')
+    st.session_state.data_saver = 'Mobi' in user_agent or 'Android' in user_agent
+if 'poi_tiles' not in st.session_state:
+    st.session_state.poi_tiles = {}
+if 'ranked_at' not in st.session_state:
+    st.session_state.ranked_at = None
+if 'location_fixes' not in st.session_state:
+    st.session_state.location_fixes = []
+if 'prefetched' not in st.session_state:
+    st.session_state.prefetched = {}  # place key -> time its warm-up started
+if 'search_report' not in st.session_state:
+    st.session_state.search_report = None
+
+
+def get_nearby_places(lat, lon, radius=SEARCH_RADIUS, elements=None):
+    """Get nearby notable places from OpenStreetMap data and verify Wikipedia availability
+
+    Pass `elements` to rank candidates that were already fetched instead of querying again.
+    """
+    if st.session_state.get('adaptive_search') and elements is not None:
+        # Widen ring by ring up to the search radius, checking likely places first
+        rings = tuple(ring for ring in places.ADAPTIVE_RINGS if ring < radius) + (radius,)
+        with st.spinner("Checking for available stories..."):
+            found, st.session_state.search_report = places.adaptive_nearby_places(
+                lat, lon, rings=rings, elements=elements
+            )
+        return found
 
-
-def get_wikipedia_info(place_name, location=None):
-    """Fetch information about a place from Wikipedia with strict location verification"""
+    st.session_state.search_report = None
     try:
-        wiki_wiki = wikipediaapi.Wikipedia(
-            language='en',
-            extract_format=wikipediaapi.ExtractFormat.WIKI,
-            user_agent='CityStoryWalker/1.0'
-        )
+        candidates = places.nearby_candidates(lat, lon, radius, elements)
+    except Exception as e:
+        st.error(f"Error with Overpass API: {str(e)}")
+        candidates = []
 
-        # Get location context
-        area = None
-        city = None
-        country = "UK"
-
-        if location:
-            try:
-                geolocator = Nominatim(user_agent="city_story_walker")
-                location_info = geolocator.reverse(f"{location[0]}, {location[1]}", language='en')
-
-                if location_info and location_info.raw:
-                    address = location_info.raw.get('address', {})
-                    area = address.get('suburb') or address.get('neighbourhood') or address.get('district')
-                    city = address.get('city') or address.get('town')
-                    country = address.get('country', 'UK')
-            except:
-                pass
-
-        # Build search queries with strong location context
-        search_queries = []
-
-        # For churches, always include location
-        if any(term in place_name.lower() for term in ['church', 'cathedral', 'chapel', 'abbey']):
-            if area and city:
-                search_queries = [
-                    f"{place_name}, {area}, {city}",
-                    f"{place_name}, {area}",
-                    f"{place_name}, {city}"
-                ]
-            elif city:
-                search_queries = [f"{place_name}, {city}"]
-            # Don't search without location for churches
-            return None if not search_queries else None
-
-        # For statues/memorials, look for the specific installation
-        elif any(term in place_name.lower() for term in ['statue', 'memorial', 'monument', 'sculpture']):
-            if area:
-                search_queries = [
-                    f"{place_name} ({area})",
-                    f"{place_name} sculpture {area}",
-                    f"{place_name} statue {area}"
-                ]
-            # Don't return generic articles about concepts
-            # We'll verify the content below
-        else:
-            # For other places, try with location first
-            if area:
-                search_queries.append(f"{place_name}, {area}")
-            if city and city != area:
-                search_queries.append(f"{place_name}, {city}")
-            search_queries.append(place_name)
-
-        # Try each search query
-        for query in search_queries:
-            page = wiki_wiki.page(query)
-
-            if page.exists():
-                content = page.text[:1000].lower()
-
-                # Verify the content is about the RIGHT place
-                verification_passed = False
-
-                # For churches - must mention the location
-                if any(term in place_name.lower() for term in ['church', 'cathedral', 'chapel']):
-                    if area and area.lower() in content:
-                        verification_passed = True
-                    elif city and city.lower() in content:
-                        verification_passed = True
-
-                # For statues/sculptures - must be about an artwork, not a company or concept
-                elif any(term in place_name.lower() for term in ['statue', 'memorial', 'sculpture']):
-                    # Skip if it's about a company, brand, or activity
-                    skip_terms = ['company', 'corporation', 'brand', 'whisky', 'whiskey', 'activity', 'exercise',
-                                  'walking the dog']
-                    if any(term in content for term in skip_terms):
-                        continue
-
-                    # Must mention sculpture/statue/artwork
-                    artwork_terms = ['sculpture', 'statue', 'artwork', 'memorial', 'monument', 'artist', 'sculptor',
-                                     'bronze', 'stone', 'marble']
-                    if any(term in content for term in artwork_terms):
-                        # And should mention the location if it's a real statue
-                        if (area and area.lower() in content) or (city and city.lower() in content):
-                            verification_passed = True
-                else:
-                    # For other places, be more lenient but still check
-                    verification_passed = True
-
-                if verification_passed:
-                    full_content = page.text[:2000] if len(page.text) > 2000 else page.text
-                    return {
-                        'title': page.title,
-                        'content': full_content,
-                        'url': page.fullurl
-                    }
-
-        # If we get here, no valid Wikipedia article was found
-        return None
+    # Now verify which places have Wikipedia articles
+    with st.spinner("Checking for available stories..."):
+        return places.verify_places(candidates, lat, lon, radius)
+
+
+def refresh_nearby_places(lat, lon, radius=SEARCH_RADIUS):
+    """Update nearby places for a new position, reusing candidates fetched earlier in this session"""
+    # Small moves are GPS jitter; keep the current list
+    ranked_at = st.session_state.ranked_at
+    if ranked_at and poi_index.haversine_m(ranked_at[0], ranked_at[1], lat, lon) < RERANK_DISTANCE:
+        return st.session_state.nearby_places
+
+    # Adaptive search widens past the fixed radius where places are sparse, so
+    # it gets candidates out to its widest ring
+    if st.session_state.get('adaptive_search'):
+        radius = max(radius, places.ADAPTIVE_RINGS[-1])
+
+    tiles = st.session_state.poi_tiles
+    if any(tile not in tiles for tile in poi_index.tiles_around(lat, lon, radius)):
+        missing = [
+            tile for tile in poi_index.tiles_around(lat, lon, radius + REFETCH_MARGIN)
+            if tile not in tiles
+        ]
+        try:
+            tiles.update(places.fetch_tile_elements(missing))
+        except Exception as e:
+            st.error(f"Error with Overpass API: {str(e)}")
+            return st.session_state.nearby_places
 
-    except Exception as e:
-        return None  # Silently fail - no Wikipedia article found
+        # Forget tiles the walker has left behind
+        if len(tiles) > MAX_SESSION_TILES:
+            keep = set(poi_index.tiles_around(lat, lon, radius + REFETCH_MARGIN))
+            for tile in [tile for tile in tiles if tile not in keep]:
+                del tiles[tile]
 
-def create_narrative_story(place_info, selected_place=None):
-    """Use OpenAI to transform Wikipedia content into an engaging narrative"""
-    if not place_info:
-        return None
+    elements = [element for tile in poi_index.tiles_around(lat, lon, radius) for element in tiles[tile]]
+    st.session_state.ranked_at = (lat, lon)
 
-    # Get location context
-    location_context = ""
-    if selected_place and 'lat' in selected_place and 'lon' in selected_place:
-        try:
-            geolocator = Nominatim(user_agent="city_story_walker")
-            location_info = geolocator.reverse(f"{selected_place['lat']}, {selected_place['lon']}", language='en')
-
-            if location_info and location_info.raw:
-                address = location_info.raw.get('address', {})
-                area = address.get('suburb') or address.get('neighbourhood') or address.get('district')
-                city = address.get('city') or address.get('town', 'London')
-                location_context = f"The visitor is currently in {area}, {city}"
-        except:
-            location_context = "The visitor is currently in London"
-
-    # Check if this is a memorial
-    is_memorial = False
-    memorial_context = ""
-    if selected_place:
-        if selected_place.get('type') == 'memorial' or 'memorial' in selected_place.get('name', '').lower():
-            is_memorial = True
-            memorial_context = f"""
-            Important: The visitor is standing at the {selected_place['name']} memorial/monument in {location_context}.
-            Frame the story from this perspective - they are AT the memorial, not reading about the person in abstract.
-            Connect the person's story to why they are memorialized in THIS specific location.
-            """
-
-    prompt = f"""
-    Transform the following Wikipedia information about {place_info['title']} into an engaging, 
-    narrative-driven story that someone would enjoy hearing while walking past this location. 
-
-    {location_context}
-    {memorial_context}
-
-    Make it conversational, interesting, and about 2-3 minutes of speaking time (roughly 300-400 words).
-    Include interesting facts, historical context, or amusing anecdotes if available.
-    Write it as if you're a knowledgeable local guide talking to a friend who is standing right at this spot.
-
-    If this is about a person who has a memorial here, explain their connection to this area and why they're commemorated here.
-
-    Source information:
-    {place_info['content']}
-
-    Create an engaging narrative story that's relevant to someone standing at this location:
-    """
+    # Verification results are cached, so re-ranking only checks newly seen candidates
+    return get_nearby_places(lat, lon, radius, elements=elements)
 
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system",
-                 "content": "You are a master storyteller who creates engaging narratives about places. You always consider the visitor's current location and frame stories appropriately."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.8,
-            max_tokens=500
-        )
 
-        return response.choices[0].message.content
-    except Exception as e:
-        st.error(f"Error creating narrative: {str(e)}")
-        return None
+@st.cache_resource
+def get_prefetcher():
+    """Process-wide prefetch pool shared by all sessions"""
+    return prefetch.Prefetcher(stories.warm_place, PREFETCH_WORKERS)
 
 
-def generate_audio_story(text):
-    """Convert the story text to speech using ElevenLabs"""
-    try:
-        # Initialize ElevenLabs client
-        client = ElevenLabs(
-            api_key=st.secrets["ELEVENLABS_API_KEY"]
-        )
+def audio_format():
+    """ElevenLabs output format for this session's narration"""
+    return narration.DATA_SAVER_AUDIO_FORMAT if st.session_state.data_saver else narration.AUDIO_FORMAT
 
-        # Generate audio using text_to_speech.convert
-        audio = client.text_to_speech.convert(
-            text=text,
-            voice_id="21m00Tcm4TlvDq8ikWAM",  # Rachel's voice ID
-            model_id="eleven_monolingual_v1",
-            output_format="mp3_44100_128"
-        )
 
-        # Save audio to a temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        save(audio, temp_file.name)
+@st.cache_resource
+def start_artifact_sweeper():
+    """Evict expired and excess artifacts in the background, once per process"""
+    artifact_cache.start_sweeper()
 
-        return temp_file.name
-    except Exception as e:
-        st.error(f"Error generating audio: {str(e)}")
-        return None
-
-
-def get_nearby_places(lat, lon, radius=1000):
-    """Get nearby notable places using OpenStreetMap Overpass API and verify Wikipedia availability"""
-
-    overpass_url = "http://overpass-api.de/api/interpreter"
-
-    # More comprehensive query with proper formatting
-    overpass_query = f"""
-    [out:json];
-    (
-      node["name"]["historic"](around:{radius},{lat},{lon});
-      node["name"]["tourism"](around:{radius},{lat},{lon});
-      node["name"]["amenity"~"place_of_worship|theatre|arts_centre|library|community_centre"](around:{radius},{lat},{lon});
-      node["name"]["leisure"~"park|garden"](around:{radius},{lat},{lon});
-      node["name"]["building"~"church|theatre|museum"](around:{radius},{lat},{lon});
-      node["name"]["memorial"](around:{radius},{lat},{lon});
-      node["name"]["man_made"~"monument|memorial"](around:{radius},{lat},{lon});
-      way["name"]["historic"](around:{radius},{lat},{lon});
-      way["name"]["tourism"](around:{radius},{lat},{lon});
-      way["name"]["amenity"~"place_of_worship|theatre|arts_centre|library|community_centre"](around:{radius},{lat},{lon});
-      way["name"]["leisure"~"park|garden"](around:{radius},{lat},{lon});
-      way["name"]["building"~"church|theatre|museum"](around:{radius},{lat},{lon});
-      way["name"]["memorial"](around:{radius},{lat},{lon});
-      relation["name"]["historic"](around:{radius},{lat},{lon});
-      relation["name"]["tourism"](around:{radius},{lat},{lon});
-      relation["name"]["amenity"~"place_of_worship|theatre|arts_centre|library|community_centre"](around:{radius},{lat},{lon});
-      relation["name"]["leisure"~"park|garden"](around:{radius},{lat},{lon});
-    );
-    out center;
+
+start_artifact_sweeper()
+
+
+# Plays the audio players on the page as one playlist: each player starts the
+# next when it ends, and a chunk that arrives after the one before it ended
+# starts at once
+PLAYLIST_SCRIPT = """
+<script>
+if (!window.steepdPlaylist) {
+    window.steepdPlaylist = true;
+    const players = () => Array.from(document.querySelectorAll('audio[data-testid="stAudio"]'));
+    const playNext = (player) => {
+        const next = players()[players().indexOf(player) + 1];
+        if (next) {
+            next.play().catch(() => {});
+        }
+    };
+    document.addEventListener('ended', (event) => playNext(event.target), true);
+    new MutationObserver(() => {
+        const all = players();
+        const waiting = all.findIndex((player, i) => i > 0 && all[i - 1].ended && player.paused && !player.played.length);
+        if (waiting > 0 && !all.some((player) => !player.paused)) {
+            all[waiting].play().catch(() => {});
+        }
+    }).observe(document.body, {childList: true, subtree: true});
+}
+</script>
+"""
+
+
+def play_audio(paths, autoplay=False):
+    """Show audio players for artifact paths, keeping them pinned for this session
+
+    Only the first player autoplays; each of the rest starts when the one above it ends.
     """
+    artifact_cache.pin(st.session_state.session_id, paths)
+    for i, path in enumerate(paths):
+        try:
+            data = artifact_cache.read_bytes(path)
+        except OSError:
+            continue  # Evicted or removed; the text is still shown
+        st.audio(data, format='audio/mp3', autoplay=autoplay and i == 0)
+    if paths:
+        st.html(PLAYLIST_SCRIPT, unsafe_allow_javascript=True)
+
+
+def record_location_fix(location):
+    """Keep recent browser location fixes for estimating speed and heading"""
+    fixes = st.session_state.location_fixes
+    fixes.append((time.time(), location['latitude'], location['longitude'],
+                  location.get('speed'), location.get('heading')))
+    del fixes[:-MAX_LOCATION_FIXES]
+
+
+def prefetch_upcoming_places():
+    """Warm stories for the places the walker is expected to reach next"""
+    motion = prefetch.estimate_motion(st.session_state.location_fixes)
+    if not motion or not st.session_state.current_location:
+        return
+
+    lat, lon = st.session_state.current_location
+    upcoming = prefetch.rank_by_arrival(st.session_state.nearby_places, lat, lon, *motion)
+
+    prefetcher = get_prefetcher()
+    output_format = audio_format()
+    # Warm-ups older than the window no longer count against the budget
+    now = time.time()
+    prefetched = st.session_state.prefetched
+    for key in [key for key, started in prefetched.items() if now - started > PREFETCH_WINDOW]:
+        del prefetched[key]
+
+    for _, place in upcoming[:PREFETCH_TOP_N]:
+        if len(prefetched) >= PREFETCH_BUDGET:
+            break
+
+        key = place_key(place['name'], (place['lat'], place['lon']))
+        if key not in prefetched and prefetcher.submit(key, place, output_format):
+            prefetched[key] = now
+
+
+def show_map(lat, lon, places=None):
+    """Show the map around the current location, redrawing markers only when the places change"""
+    from streamlit_folium import st_folium
+
+    # The base map is identical for every rerun within a bucket, so the browser
+    # keeps it mounted; the live position only moves the view
+    st_folium(
+        map_view.base_map(map_view.center_bucket(lat, lon)),
+        center=(lat, lon),
+        feature_group_to_add=map_view.marker_layer(lat, lon, places),
+        returned_objects=[],  # Panning and zooming don't rerun the script
+        width=500,
+        height=400
+    )
 
-    # Commercial chains to exclude
-    exclude_terms = [
-        'premier inn', 'travelodge', 'holiday inn', 'ibis', 'hilton', 'marriott',
-        'tesco', 'sainsbury', 'asda', 'lidl', 'aldi', 'co-op', 'waitrose',
-        'mcdonalds', 'burger king', 'kfc', 'subway', 'starbucks', 'costa',
-        'boots', 'superdrug', 'lloyds pharmacy', 'hsbc', 'barclays', 'natwest',
-        'santander', 'halifax', 'nationwide'
-    ]
 
-    potential_places = []
-    seen_names = set()
+@st.cache_resource
+def get_story_pipeline():
+    """Process-wide background pipeline shared by all sessions"""
+    return story_pipeline.StoryPipeline(PIPELINE_WORKERS)
 
-    try:
-        response = requests.get(overpass_url, params={'data': overpass_query}, timeout=10)
-
-        if response.status_code == 200:
-            data = response.json()
-
-            for element in data.get('elements', []):
-                tags = element.get('tags', {})
-                name = tags.get('name')
-
-                if not name or name in seen_names:
-                    continue
-
-                # Skip commercial chains
-                if any(exclude in name.lower() for exclude in exclude_terms):
-                    continue
-
-                seen_names.add(name)
-
-                # Get coordinates
-                if 'lat' in element and 'lon' in element:
-                    elem_lat = element['lat']
-                    elem_lon = element['lon']
-                elif 'center' in element:
-                    elem_lat = element['center']['lat']
-                    elem_lon = element['center']['lon']
-                else:
-                    continue
-
-                # Calculate distance
-                distance = geodesic((lat, lon), (elem_lat, elem_lon)).meters
-
-                # Build place info
-                place_info = {
-                    'name': name,
-                    'lat': elem_lat,
-                    'lon': elem_lon,
-                    'distance': int(distance),
-                    'tags': tags  # Store all tags for context
-                }
-
-                # Add type information for context
-                if 'memorial' in tags or 'man_made' in tags:
-                    place_info['type'] = 'memorial'
-                elif 'amenity' in tags:
-                    place_info['type'] = tags['amenity']
-                elif 'tourism' in tags:
-                    place_info['type'] = tags['tourism']
-                elif 'leisure' in tags:
-                    place_info['type'] = tags['leisure']
-                elif 'historic' in tags:
-                    place_info['type'] = 'historic'
-                elif 'building' in tags:
-                    place_info['type'] = tags['building']
-
-                potential_places.append(place_info)
-
-            # Sort by distance
-            potential_places.sort(key=lambda x: x['distance'])
 
-    except Exception as e:
-        st.error(f"Error with Overpass API: {str(e)}")
+def start_story(place):
+    """Start fetching, writing and narrating a place's story in the background"""
+    if st.session_state.story_job:
+        st.session_state.story_job.cancel()
 
-    # Now verify which places have Wikipedia articles
-    places_with_wiki = []
+    st.session_state.selected_place = place
+    st.session_state.story = None
+    st.session_state.audio_file = None
+    st.session_state.story_audio = None
+    st.session_state.story_job = get_story_pipeline().start(stories.story_stages(place, audio_format()))
+
+
+STAGE_PROGRESS = {
+    'wikipedia': "Fetching information...",
+    'story': "Creating your story...",
+    'narration': "Generating audio narration..."
+}
 
-    with st.spinner("Checking for available stories..."):
-        for place in potential_places[:20]:  # Check up to 20 places
-            wiki_info = get_wikipedia_info(place['name'], location=(place['lat'], place['lon']))
-            if wiki_info:
-                place['has_wiki'] = True
-                place['wiki_title'] = wiki_info['title']
-                places_with_wiki.append(place)
-
-                # Stop after finding 8 places with Wikipedia articles
-                if len(places_with_wiki) >= 8:
-                    break
-
-    return places_with_wiki
-def create_map(center_lat, center_lon, places=None):
-    """Create an interactive map with the current location and nearby places"""
-    m = folium.Map(location=[center_lat, center_lon], zoom_start=15)
-
-    # Add current location marker
-    folium.Marker(
-        [center_lat, center_lon],
-        popup="You are here",
-        tooltip="Current Location",
-        icon=folium.Icon(color='red', icon='user')
-    ).add_to(m)
-
-    # Add nearby places
-    if places:
-        for place in places:
-            folium.Marker(
-                [place['lat'], place['lon']],
-                popup=place['name'],
-                tooltip=f"{place['name']} ({place['distance']}m away)",
-                icon=folium.Icon(color='blue', icon='info-sign')
-            ).add_to(m)
-
-    return m
+
+def show_story(following):
+    """Show the selected place's story, polling its background job while `following`"""
+    job = st.session_state.story_job
+    status = job.snapshot() if job else None
+    if status and status['done']:
+        results = status['results']
+        st.session_state.story = results.get('story')
+        st.session_state.audio_file = results.get('narration')
+        if results.get('wikipedia') and 'lat' not in st.session_state.selected_place:
+            st.session_state.selected_place = {'name': results['wikipedia']['title']}
+
+        # Narration heard in chunks keeps playing from them; otherwise from the single file
+        if st.session_state.story_audio is None:
+            audio_file = st.session_state.audio_file
+            st.session_state.story_audio = status.get('audio') or ([audio_file] if audio_file else [])
+
+        # Rerun the whole app once so the fragment stops polling
+        if following:
+            st.rerun(scope="app")
+
+    st.subheader(f"**{st.session_state.selected_place['name']}**")
+
+    # Same layout while running and when done, so audio that is playing isn't restarted
+    progress = st.empty()
+    if status and not status['done']:
+        running = [name for name, state in status['stages'].items() if state == story_pipeline.RUNNING]
+        if running:
+            progress.caption(f"⏳ {STAGE_PROGRESS[running[0]]}")
+
+        text = status.get('text') or status['results'].get('story')
+        if text:
+            st.write(text)
+
+        play_audio(status.get('audio', []), autoplay=True)
+        return
+
+    if st.session_state.story:
+        st.write(st.session_state.story)
+
+        # Same players as while polling, so narration that is playing carries on
+        play_audio(st.session_state.story_audio or [], autoplay=True)
+
+    if status:
+        stages, errors = status['stages'], status['errors']
+        if stages['wikipedia'] == story_pipeline.DONE and not status['results']['wikipedia']:
+            st.warning("No Wikipedia information found for this place.")
+        elif stages['wikipedia'] == story_pipeline.TIMED_OUT:
+            st.warning("Wikipedia is taking too long to answer. Please try again.")
+        elif stages['story'] == story_pipeline.TIMED_OUT:
+            st.error("The story took too long to create. Please try again.")
+        elif stages['narration'] == story_pipeline.TIMED_OUT:
+            st.warning("Narration is taking too long, so here is the story as text.")
+
+        for name, error in errors.items():
+            st.error(f"Error in {name}: {error}")
+    elif not st.session_state.story:
+        st.info("Story is being generated...")
 
 
 # Streamlit UI
@@ -432,9 +381,9 @@ if 'lat' in query_params and 'lon' in query_params:
         if 'location_set' not in st.session_state:
             st.session_state.current_location = (auto_lat, auto_lon)
             st.session_state.location_set = True
-            st.session_state.nearby_places = get_nearby_places(auto_lat, auto_lon)
-    except:
-        pass
+            st.session_state.nearby_places = refresh_nearby_places(auto_lat, auto_lon)
+    except ValueError:
+        pass  # Not a coordinate; ignore it
 
 # Sidebar for controls
 with st.sidebar:
@@ -457,13 +406,15 @@ with st.sidebar:
         if location and location['latitude'] is not None:
             new_location = (location['latitude'], location['longitude'])
 
-            # Only update if location changed significantly
+            # Re-rank locally as the walker moves; jitter and short moves don't hit the network
             if st.session_state.current_location != new_location:
                 st.session_state.current_location = new_location
-                st.session_state.nearby_places = get_nearby_places(
+                record_location_fix(location)
+                st.session_state.nearby_places = refresh_nearby_places(
                     location['latitude'],
                     location['longitude']
                 )
+                prefetch_upcoming_places()
 
         if st.session_state.current_location:
             st.success(
@@ -490,7 +441,7 @@ with st.sidebar:
 
         if st.button("📍 Set Location", type="primary"):
             st.session_state.current_location = (lat, lon)
-            st.session_state.nearby_places = get_nearby_places(lat, lon)
+            st.session_state.nearby_places = refresh_nearby_places(lat, lon)
             st.success(f"Location set: {lat:.4f}, {lon:.4f}")
 
         if st.session_state.current_location:
@@ -499,7 +450,10 @@ with st.sidebar:
     # Refresh button
     if st.session_state.current_location:
         if st.button("🔄 Refresh Nearby Places"):
-            st.session_state.nearby_places = get_nearby_places(
+            # Start over with freshly fetched candidates
+            st.session_state.poi_tiles = {}
+            st.session_state.ranked_at = None
+            st.session_state.nearby_places = refresh_nearby_places(
                 st.session_state.current_location[0],
                 st.session_state.current_location[1]
             )
@@ -509,30 +463,20 @@ with st.sidebar:
     # Place selection
     if st.session_state.nearby_places:
         st.header("🏛️ Nearby Places")
+        pack = city_pack.default_pack()
+        if pack and pack.covers(*st.session_state.current_location, 0):
+            st.caption(f"📦 Offline city pack: {pack.summary()['places']} places, no connection needed")
+        report = st.session_state.search_report
+        if report:
+            st.caption(
+                f"Adaptive search: {report['radius']} m, {report['checked']} of "
+                f"{report['candidates']} candidates checked, {report['upstream_calls']} upstream requests"
+            )
         for place in st.session_state.nearby_places:
             if st.button(f"📖 {place['name']}", key=place['name']):
-                st.session_state.selected_place = place
-
-                # Fetch Wikipedia info with location context
-                with st.spinner("Fetching information..."):
-                    wiki_info = get_wikipedia_info(
-                        place['name'],
-                        location=(place['lat'], place['lon'])
-                    )
-
-                if wiki_info:
-                    # Generate narrative with location context
-                    with st.spinner("Creating your story..."):
-                        story = create_narrative_story(wiki_info, selected_place=place)
-                        st.session_state.story = story
-
-                    # Generate audio
-                    if story:
-                        with st.spinner("Generating audio narration..."):
-                            audio_file = generate_audio_story(story)
-                            st.session_state.audio_file = audio_file
-                else:
-                    st.warning("No Wikipedia information found for this place.")
+                # Wikipedia info (already cached if verified nearby), narrative and
+                # audio are produced in the background while the page stays live
+                start_story(place)
 
     st.divider()
 
@@ -541,51 +485,80 @@ with st.sidebar:
     manual_place = st.text_input("Enter a place name")
     if st.button("Search"):
         if manual_place:
-            with st.spinner("Searching..."):
-                wiki_info = get_wikipedia_info(manual_place)
+            start_story({'name': manual_place})
 
-            if wiki_info:
-                st.session_state.selected_place = {'name': wiki_info['title']}
+    st.divider()
 
-                with st.spinner("Creating your story..."):
-                    story = create_narrative_story(wiki_info)
-                    st.session_state.story = story
+    # Smaller narration files for phones on mobile data
+    st.toggle(
+        "📱 Data saver narration",
+        key="data_saver",
+        help="Lower-bitrate audio, about a quarter of the download. Applies to the next story."
+    )
 
-                if story:
-                    with st.spinner("Generating audio narration..."):
-                        audio_file = generate_audio_story(story)
-                        st.session_state.audio_file = audio_file
-            else:
-                st.error("No information found for this place.")
+    # Stop widening the search once a few likely places have articles
+    st.toggle(
+        "🎯 Adaptive search",
+        key="adaptive_search",
+        help="Search outwards in rings and check places tagged as notable first. Applies on the next refresh."
+    )
+
+    st.divider()
+
+    # Upstream connection pooling and lookup shortcuts
+    with st.expander("🔌 Upstream stats"):
+        connection_stats = http_clients.stats.snapshot()
+        if connection_stats:
+            st.table(connection_stats)
+        else:
+            st.caption("No upstream requests yet")
+
+        fast_path = wiki_resolver.fast_path_stats
+        st.caption(
+            f"OSM tag fast path: {fast_path.hits}/{fast_path.lookups} Wikipedia lookups "
+            f"({fast_path.hit_rate():.0%}), {fast_path.tagged} tagged"
+        )
+
+    # Where the time goes: upstream calls and pipeline stages, cache effectiveness and deduplication
+    with st.expander("⏱️ Latency"):
+        latency = telemetry.tracer.latency_summary()
+        if latency:
+            st.table([dict(span=name, **stats) for name, stats in latency.items()])
+        else:
+            st.caption("Nothing timed yet")
+
+        cache_stats = telemetry.tracer.cache_summary()
+        if cache_stats:
+            st.table([dict(cache=name, **stats) for name, stats in cache_stats.items()])
+
+        # Calls that waited on an identical one already in flight instead of repeating it
+        flight_stats = telemetry.tracer.flight_summary()
+        if flight_stats:
+            st.table([dict(call=name, **stats) for name, stats in flight_stats.items()])
+
+        if telemetry.tracer.trace_file:
+            st.caption(f"Spans are written to {telemetry.tracer.trace_file}")
 
 col1, col2 = st.columns([1, 1])
 
 with col1:
     st.header("🗺️ Map View")
     if st.session_state.current_location:
-        m = create_map(
+        show_map(
             st.session_state.current_location[0],
             st.session_state.current_location[1],
             st.session_state.nearby_places
         )
-        st_folium(m, width=500, height=400)
     else:
         st.info("Set your location in the sidebar to see the map")
 
 with col2:
     st.header("📚 Story")
     if st.session_state.selected_place:
-        st.subheader(f"**{st.session_state.selected_place['name']}**")
-
-        if st.session_state.story:
-            st.write(st.session_state.story)
-
-            if st.session_state.audio_file:
-                st.audio(st.session_state.audio_file, format='audio/mp3')
-
-
-        else:
-            st.info("Story is being generated...")
+        # Poll for progress only while a story is on its way
+        job = st.session_state.story_job
+        following = bool(job) and not job.done()
+        st.fragment(run_every=POLL_INTERVAL if following else None)(show_story)(following)
     else:
         st.info("Select a place from the sidebar to hear its story")
 
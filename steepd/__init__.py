@@ -0,0 +1,51 @@
+"""Steepd core: find notable places nearby, fetch their Wikipedia articles,
+write stories about them and narrate those stories.
+
+    import steepd
+    steepd.configure(openai_api_key=..., elevenlabs_api_key=...)
+    places = steepd.get_nearby_places(51.5080, -0.1281)
+    article = steepd.get_wikipedia_info(places[0]['name'], location=(places[0]['lat'], places[0]['lon']))
+    story = steepd.generate_story(article, places[0])
+    mp3_path = steepd.synthesize_audio(story)
+
+Set STEEPD_CITY_PACK, or call steepd.use_pack(path), to serve the places,
+articles, stories and narration of a pack from tools/build_city_pack.py
+offline.
+
+Names are imported on first use, so `import steepd` stays cheap; the OpenAI
+and ElevenLabs SDKs are only loaded when a story or narration is requested.
+"""
+import importlib
+
+_EXPORTS = {
+    'configure': 'steepd.clients',
+    'get_nearby_places': 'steepd.places',
+    'nearby_candidates': 'steepd.places',
+    'verify_places': 'steepd.places',
+    'get_wikipedia_info': 'steepd.places',
+    'generate_story': 'steepd.narrative',
+    'stream_story': 'steepd.narrative',
+    'get_cached_story': 'steepd.narrative',
+    'synthesize_audio': 'steepd.narration',
+    'get_cached_audio': 'steepd.narration',
+    'PipelinedNarrator': 'steepd.narration',
+    'story_stages': 'steepd.stories',
+    'warm_place': 'steepd.stories',
+    'StoryPipeline': 'steepd.story_pipeline',
+    'use_pack': 'steepd.city_pack'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'steepd' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
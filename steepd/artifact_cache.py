@@ -0,0 +1,241 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Content-addressed store for generated stories and audio. Artifacts live as
+# plain files in one directory; a SQLite index tracks size and last access so
+# the directory can be kept under a size cap by evicting the least recently used.
+# Artifacts a session is still playing are pinned and never evicted, and a
+# background sweep also removes anything unused for ARTIFACT_MAX_AGE.
+
+ARTIFACT_DIR = os.environ.get(
+    "STEEPD_ARTIFACT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "artifacts")
+)
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("STEEPD_ARTIFACT_MAX_BYTES", 500 * 1024 * 1024))
+ARTIFACT_MAX_AGE = float(os.environ.get("STEEPD_ARTIFACT_MAX_AGE", 30 * 24 * 60 * 60))  # seconds since last use
+PIN_TTL = 2 * 60 * 60  # seconds; pins of sessions not seen for this long lapse
+SWEEP_INTERVAL = 10 * 60  # seconds between background sweeps
+MEMORY_CACHE_MAX_BYTES = int(os.environ.get("STEEPD_ARTIFACT_MEMORY_BYTES", 64 * 1024 * 1024))
+
+_db = None
+_lock = threading.Lock()
+_pins = {}  # owner -> (set of keys, last pinned at)
+_memory = OrderedDict()  # path -> bytes, most recently served last
+_memory_bytes = 0
+_memory_lock = threading.Lock()
+_sweeper = None
+
+
+def artifact_key(*parts):
+    """Hash the inputs that determine an artifact into a stable key"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def _get_db():
+    """Open (once) the artifact index (caller holds _lock)"""
+    global _db
+    if _db is None:
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        _db = sqlite3.connect(os.path.join(ARTIFACT_DIR, "index.sqlite3"), check_same_thread=False)
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            "key TEXT PRIMARY KEY, filename TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        _db.commit()
+    return _db
+
+
+def get_path(key):
+    """Return the file path for a cached artifact, or None on a miss"""
+    with _lock:
+        db = _get_db()
+        row = db.execute("SELECT filename FROM artifacts WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+
+        path = os.path.join(ARTIFACT_DIR, row[0])
+        if not os.path.exists(path):
+            # File was removed behind our back; forget it
+            db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+            db.commit()
+            return None
+
+        db.execute("UPDATE artifacts SET last_access = ? WHERE key = ?", (time.time(), key))
+        db.commit()
+        return path
+
+
+def put_bytes(key, data, suffix=""):
+    """Store an artifact and return its path"""
+    filename = key + suffix
+    path = os.path.join(ARTIFACT_DIR, filename)
+
+    with _lock:
+        db = _get_db()
+
+        # Write to a temporary name first so readers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _forget_in_memory(path)
+
+        now = time.time()
+        db.execute(
+            "INSERT OR REPLACE INTO artifacts (key, filename, size, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, filename, len(data), now, now)
+        )
+        db.commit()
+        _evict(db)
+
+    return path
+
+
+def key_of(path):
+    """The artifact key of a path returned by this module"""
+    return os.path.basename(path).split('.', 1)[0]
+
+
+def read_bytes(path):
+    """Return an artifact's contents, from memory when it was served recently
+
+    Streamlit needs the bytes of an audio file on every rerun that shows it;
+    keeping recent ones in memory saves re-reading them from disk.
+    """
+    global _memory_bytes
+    with _memory_lock:
+        if path in _memory:
+            _memory.move_to_end(path)
+            return _memory[path]
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) <= MEMORY_CACHE_MAX_BYTES:
+        with _memory_lock:
+            if path not in _memory:
+                _memory[path] = data
+                _memory_bytes += len(data)
+            while _memory_bytes > MEMORY_CACHE_MAX_BYTES:
+                _, dropped = _memory.popitem(last=False)
+                _memory_bytes -= len(dropped)
+    return data
+
+
+def _forget_in_memory(path):
+    global _memory_bytes
+    with _memory_lock:
+        data = _memory.pop(path, None)
+        if data is not None:
+            _memory_bytes -= len(data)
+
+
+def pin(owner, paths):
+    """Protect the artifacts an owner (a session) is using from eviction
+
+    Each call replaces the owner's previous pins. Owners are expected to
+    re-pin on every rerun; pins of an owner that stops doing so lapse after
+    PIN_TTL, since sessions can end without notice.
+    """
+    with _lock:
+        _pins[owner] = ({key_of(path) for path in paths if path}, time.time())
+
+
+def _pinned_keys(now):
+    """Keys pinned by live owners (caller holds _lock)"""
+    for owner in [owner for owner, (_, pinned_at) in _pins.items() if now - pinned_at > PIN_TTL]:
+        del _pins[owner]
+    return set().union(*(keys for keys, _ in _pins.values()))
+
+
+def get_text(key):
+    """Return a cached text artifact, or None on a miss"""
+    path = get_path(key)
+    if path is None:
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def put_text(key, text):
+    """Store a text artifact"""
+    return put_bytes(key, text.encode('utf-8'), suffix=".txt")
+
+
+def _remove(db, key, filename):
+    path = os.path.join(ARTIFACT_DIR, filename)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    _forget_in_memory(path)
+    db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+
+
+def _evict(db):
+    """Remove expired artifacts, then least recently used ones until the cache fits its size cap
+
+    Pinned artifacts are skipped, so the cache can briefly exceed its cap while
+    sessions are playing them. Returns the number of artifacts removed.
+    """
+    now = time.time()
+    pinned = _pinned_keys(now)
+    removed = 0
+
+    expired = db.execute(
+        "SELECT key, filename FROM artifacts WHERE last_access < ?", (now - ARTIFACT_MAX_AGE,)
+    ).fetchall()
+    for key, filename in expired:
+        if key not in pinned:
+            _remove(db, key, filename)
+            removed += 1
+
+    total = db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+    if total > ARTIFACT_CACHE_MAX_BYTES:
+        rows = db.execute("SELECT key, filename, size FROM artifacts ORDER BY last_access").fetchall()
+        for key, filename, size in rows:
+            if total <= ARTIFACT_CACHE_MAX_BYTES:
+                break
+            if key in pinned:
+                continue
+            _remove(db, key, filename)
+            total -= size
+            removed += 1
+
+    db.commit()
+    return removed
+
+
+def sweep():
+    """Run eviction now; returns the number of artifacts removed"""
+    with _lock:
+        return _evict(_get_db())
+
+
+def start_sweeper(interval=SWEEP_INTERVAL):
+    """Sweep periodically on a daemon thread, so idle servers also shed old artifacts"""
+    global _sweeper
+    with _lock:
+        if _sweeper is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    sweep()
+                except sqlite3.Error:
+                    pass  # Try again next time
+
+        _sweeper = threading.Thread(target=run, name="artifact-sweeper", daemon=True)
+        _sweeper.start()
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from steepd import artifact_cache, poi_index, telemetry
+
+# Offline city packs: the places, Wikipedia articles, stories and narration for
+# a bounding box, built ahead of time by tools/build_city_pack.py. A pack is a
+# single SQLite file whose pois/pois_rtree tables have the POI index layout, so
+# it doubles as the spatial index for its area. While a pack covers the walker,
+# nearby searches, articles, stories and audio for its places are served from
+# it without calling any upstream API.
+
+CITY_PACK_PATH = os.environ.get(
+    "STEEPD_CITY_PACK",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "city_pack.sqlite3")
+)
+PACK_FORMAT = 1  # bump when the layout changes; packs in another format are not loaded
+MATCH_DISTANCE = 25  # metres; a same-named place this close to a packed one is the same place
+
+PACK_SCHEMA = """
+    CREATE TABLE articles (poi_id INTEGER PRIMARY KEY, title TEXT NOT NULL, payload TEXT NOT NULL);
+    CREATE TABLE stories (title TEXT PRIMARY KEY, text TEXT NOT NULL);
+    CREATE TABLE narrations (text_key TEXT PRIMARY KEY, audio BLOB NOT NULL);
+"""
+
+
+def text_key(text):
+    """Key narration in a pack by the exact story text it voices"""
+    return artifact_cache.artifact_key('pack-audio', text)
+
+
+class CityPack(poi_index.PoiIndex):
+    """Places, articles, stories and narration from a pack file"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        if self.meta.get('format') != str(PACK_FORMAT):
+            raise ValueError(f"{path} is not a version {PACK_FORMAT} city pack")
+        self.audio_format = self.meta.get('audio_format')
+
+    def article(self, name, location=None):
+        """The article payload for a packed place, matched by name and, if given, location"""
+        query = "SELECT a.payload, p.lat, p.lon FROM pois p JOIN articles a ON a.poi_id = p.id WHERE p.name = ?"
+        with self._lock:
+            rows = self._db.execute(query, (name,)).fetchall()
+
+        for payload, lat, lon in rows:
+            if location is None or poi_index.haversine_m(location[0], location[1], lat, lon) <= MATCH_DISTANCE:
+                return json.loads(payload)
+        return None
+
+    def story(self, title):
+        """The packed story for an article title, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT text FROM stories WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    def audio(self, text):
+        """The packed MP3 narration of a story's text, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT audio FROM narrations WHERE text_key = ?", (text_key(text),)).fetchone()
+        return row[0] if row else None
+
+    def summary(self):
+        """Counts of packed places, stories and narrations"""
+        with self._lock:
+            places = self._db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            stories = self._db.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
+            narrations = self._db.execute("SELECT COUNT(*) FROM narrations").fetchone()[0]
+        return {'places': places, 'stories': stories, 'narrations': narrations, 'built_at': self.meta.get('built_at')}
+
+
+def write_pack(path, places, bounds, source="", **meta):
+    """Write a pack from place dicts carrying osm_type, osm_id, tags, article, story and optional audio
+
+    The pack is written beside `path` and moved into place once complete, so a
+    running app never opens half a pack.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    db.executescript(poi_index.INDEX_SCHEMA + PACK_SCHEMA)
+
+    count = 0
+    for place in places:
+        poi_id = poi_index.insert_poi(db, place['osm_type'], place['osm_id'], place['lat'], place['lon'], place['tags'])
+        if poi_id is None:
+            continue
+        article = place['article']
+        db.execute("INSERT INTO articles VALUES (?, ?, ?)", (poi_id, article['title'], json.dumps(article)))
+        # Places sharing an article share its story, and identical stories their narration
+        db.execute("INSERT OR IGNORE INTO stories VALUES (?, ?)", (article['title'], place['story']))
+        if place.get('audio'):
+            db.execute("INSERT OR IGNORE INTO narrations VALUES (?, ?)", (text_key(place['story']), place['audio']))
+        count += 1
+
+    db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+        ('format', str(PACK_FORMAT)),
+        ('bounds', json.dumps(list(bounds))),
+        ('source', source),
+        ('built_at', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+    ] + [(key, str(value)) for key, value in meta.items()])
+    db.commit()
+    db.execute("VACUUM")
+    db.close()
+
+    os.replace(tmp_path, path)
+    return count
+
+
+_default_pack = None
+_default_pack_loaded = False
+_default_pack_lock = threading.Lock()
+
+
+def default_pack():
+    """Open the configured city pack once per process, or return None if there isn't one"""
+    global _default_pack, _default_pack_loaded
+    with _default_pack_lock:
+        if not _default_pack_loaded:
+            _default_pack_loaded = True
+            if CITY_PACK_PATH and os.path.exists(CITY_PACK_PATH):
+                try:
+                    _default_pack = CityPack(CITY_PACK_PATH)
+                except (sqlite3.Error, ValueError):
+                    _default_pack = None
+        return _default_pack
+
+
+def use_pack(path):
+    """Serve from the pack at path instead of the configured one; None turns packs off"""
+    global _default_pack, _default_pack_loaded
+    with _default_pack_lock:
+        _default_pack = CityPack(path) if path else None
+        _default_pack_loaded = True
+    return _default_pack
+
+
+def find_article(name, location=None):
+    """A packed article for a place, or None; places outside any pack are left to Wikipedia"""
+    pack = default_pack()
+    if pack is None or (location is not None and not pack.covers(location[0], location[1], 0)):
+        return None
+    article = pack.article(name, location)
+    telemetry.tracer.cache('city_pack', hit=bool(article))
+    return article
+
+
+def find_story(place_info):
+    """The packed story for an article payload, or None"""
+    pack = default_pack()
+    return pack.story(place_info['title']) if pack else None
+
+
+def find_audio(text):
+    """Packed narration for a story's text as (MP3 bytes, output format), or None"""
+    pack = default_pack()
+    data = pack.audio(text) if pack else None
+    return (data, pack.audio_format) if data else None
@@ -0,0 +1,77 @@
+import os
+import threading
+
+from steepd import http_clients
+
+# Process-wide upstream clients, created on first use and shared by every
+# caller and worker thread. The OpenAI and ElevenLabs SDKs are slow to import,
+# so they are only imported when a story or narration is actually requested.
+
+_settings = {
+    'openai_api_key': os.environ.get("OPENAI_API_KEY"),
+    'openai_base_url': os.environ.get("OPENAI_BASE_URL"),  # e.g. tools/fake_openai.py
+    'elevenlabs_api_key': os.environ.get("ELEVENLABS_API_KEY"),
+    'elevenlabs_base_url': os.environ.get("ELEVENLABS_BASE_URL")  # e.g. tools/stub_upstreams.py
+}
+_clients = {}
+_lock = threading.Lock()
+
+
+def configure(**settings):
+    """Set API keys and base URLs; clients built with other settings are replaced on next use"""
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise TypeError(f"unknown settings: {', '.join(sorted(unknown))}")
+
+    with _lock:
+        changed = {key for key, value in settings.items() if _settings[key] != value}
+        _settings.update(settings)
+        if any(key.startswith('openai') for key in changed):
+            _clients.pop('openai', None)
+        if any(key.startswith('elevenlabs') for key in changed):
+            _clients.pop('elevenlabs', None)
+
+
+def _get(name, build):
+    with _lock:
+        if name not in _clients:
+            _clients[name] = build()
+        return _clients[name]
+
+
+def _build_openai():
+    from openai import OpenAI
+    return OpenAI(
+        api_key=_settings['openai_api_key'],
+        base_url=_settings['openai_base_url'],
+        max_retries=http_clients.MAX_RETRIES
+    )
+
+
+def _build_elevenlabs():
+    from elevenlabs.client import ElevenLabs
+    return ElevenLabs(
+        api_key=_settings['elevenlabs_api_key'],
+        base_url=_settings['elevenlabs_base_url'],
+        httpx_client=http_clients.make_client('elevenlabs', timeout=240)
+    )
+
+
+def openai_client():
+    """The shared OpenAI client"""
+    return _get('openai', _build_openai)
+
+
+def elevenlabs_client():
+    """The shared ElevenLabs client"""
+    return _get('elevenlabs', _build_elevenlabs)
+
+
+def wikipedia_client():
+    """The shared HTTP client for the Wikipedia and Wikidata APIs"""
+    return _get('wikipedia', lambda: http_clients.make_client('wikipedia', headers={'User-Agent': 'CityStoryWalker/1.0'}))
+
+
+def overpass_client():
+    """The shared HTTP client for the Overpass API"""
+    return _get('overpass', lambda: http_clients.make_client('overpass'))
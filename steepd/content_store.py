@@ -0,0 +1,56 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Process-wide store for verified Wikipedia payloads, so a place checked by
+# get_nearby_places doesn't need to be looked up again when it is selected.
+
+WIKI_CACHE_SIZE = 1024
+WIKI_CACHE_TTL = 24 * 60 * 60  # seconds
+WIKI_MISS_TTL = 6 * 60 * 60  # places without an article are rechecked sooner
+COORD_PRECISION = 4  # ~11 m; enough to tell same-named places apart
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed age"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+wiki_payloads = TTLCache(WIKI_CACHE_SIZE, WIKI_CACHE_TTL)
+wiki_misses = TTLCache(WIKI_CACHE_SIZE, WIKI_MISS_TTL)
+
+
+def place_key(place_name, location=None):
+    """Key a place by name and rounded coordinates"""
+    if location is None:
+        return place_name, None, None
+    return place_name, round(location[0], COORD_PRECISION), round(location[1], COORD_PRECISION)
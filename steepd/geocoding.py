@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from steepd import telemetry
+
+# Reverse-geocode cache shared by every Streamlit session in this process.
+# Lookups are keyed on a geohash cell (~150 m x 150 m at precision 7) so nearby
+# places share one Nominatim request.
+
+GEOHASH_PRECISION = 7
+MEMORY_CACHE_SIZE = 2048
+EMPTY_ADDRESS_TTL = 3600  # seconds an empty answer is kept before the cell is asked again
+NOMINATIM_MIN_INTERVAL = 1.0  # Nominatim usage policy: at most 1 request per second
+NOMINATIM_DOMAIN = os.environ.get("STEEPD_NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.environ.get("STEEPD_NOMINATIM_SCHEME", "https")
+CACHE_DB_PATH = os.environ.get(
+    "STEEPD_GEOCODE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "geocode.sqlite3")
+)
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+_geolocator = None  # created on the first cache miss; geopy is only imported then
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+_fetch_lock = threading.Lock()
+_last_request_at = 0.0
+_db = None
+_db_lock = threading.Lock()
+
+
+def geohash(lat, lon, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        # Alternate between longitude and latitude bits, starting with longitude
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def _get_db():
+    """Open (once) the on-disk cache tier"""
+    global _db
+    if _db is None:
+        os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+        _db = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False)
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS reverse_geocode ("
+            "cell TEXT PRIMARY KEY, address TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        _db.commit()
+    return _db
+
+
+def _memory_get(cell):
+    with _memory_lock:
+        if cell in _memory_cache:
+            _memory_cache.move_to_end(cell)
+            return _memory_cache[cell]
+    return None
+
+
+def _memory_put(cell, address):
+    with _memory_lock:
+        _memory_cache[cell] = address
+        _memory_cache.move_to_end(cell)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _disk_get(cell):
+    try:
+        with _db_lock:
+            row = _get_db().execute(
+                "SELECT address, fetched_at FROM reverse_geocode WHERE cell = ?", (cell,)
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+    if not row:
+        return None
+
+    # An empty answer may be transient, so it expires
+    address = json.loads(row[0])
+    if not address and time.time() - row[1] > EMPTY_ADDRESS_TTL:
+        return None
+    return address
+
+
+def _disk_put(cell, address):
+    try:
+        with _db_lock:
+            db = _get_db()
+            db.execute(
+                "INSERT OR REPLACE INTO reverse_geocode (cell, address, fetched_at) VALUES (?, ?, ?)",
+                (cell, json.dumps(address), time.time())
+            )
+            db.commit()
+    except sqlite3.Error:
+        pass  # The disk tier is best effort; the memory tier still holds the result
+
+
+def _get_geolocator():
+    """The shared Nominatim geocoder (caller holds _fetch_lock)"""
+    global _geolocator
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
+        _geolocator = Nominatim(user_agent="city_story_walker", domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
+    return _geolocator
+
+
+def _wait_for_rate_limit():
+    """Block until another Nominatim request is allowed (caller holds _fetch_lock)"""
+    global _last_request_at
+    wait = _last_request_at + NOMINATIM_MIN_INTERVAL - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
+    _last_request_at = time.monotonic()
+
+
+def reverse_geocode(lat, lon):
+    """Return the Nominatim address dict for a coordinate, served from cache where possible"""
+    cell = geohash(lat, lon)
+
+    address = _memory_get(cell)
+    if address is not None:
+        telemetry.tracer.cache('geocode', hit=True)
+        return address
+
+    address = _disk_get(cell)
+    if address is not None:
+        telemetry.tracer.cache('geocode', hit=True)
+        if address:
+            _memory_put(cell, address)
+        return address
+
+    telemetry.tracer.cache('geocode', hit=False)
+
+    # Misses are serialized so the rate limit holds across threads and sessions,
+    # and a cell requested twice concurrently is only fetched once
+    with _fetch_lock:
+        address = _memory_get(cell)
+        if address is None:
+            address = _disk_get(cell)
+        if address is not None:
+            return address
+
+        _wait_for_rate_limit()
+        with telemetry.span('nominatim.reverse'):
+            location_info = _get_geolocator().reverse(f"{lat}, {lon}", language='en')
+
+        address = {}
+        if location_info and location_info.raw:
+            address = location_info.raw.get('address', {})
+
+        # Empty answers are only kept on disk, where they expire
+        if address:
+            _memory_put(cell, address)
+        _disk_put(cell, address)
+
+    return address
@@ -0,0 +1,112 @@
+import os
+import time
+import threading
+from collections import defaultdict
+
+import httpx
+
+# Shared HTTP plumbing for the upstream APIs: keep-alive connection pools,
+# retry with exponential backoff, and counters showing how often connections
+# are reused. Clients built here are long-lived and safe to share across threads.
+
+POOL_SIZE = int(os.environ.get("STEEPD_HTTP_POOL_SIZE", 10))  # keep-alive connections per host
+MAX_RETRIES = int(os.environ.get("STEEPD_HTTP_MAX_RETRIES", 3))
+BACKOFF = float(os.environ.get("STEEPD_HTTP_BACKOFF", 0.5))  # seconds; doubles on each retry
+MAX_BACKOFF = 30.0
+KEEPALIVE_EXPIRY = 60.0  # seconds an idle connection is kept open
+TIMEOUT = 10.0
+RETRY_STATUSES = {429, 502, 503, 504}
+# A 5xx may come after the upstream did the work, so only requests that are
+# safe to repeat are retried on one; a 429 means the request was refused
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class ConnectionStats:
+    """Per-service counts of requests sent and TCP connections opened"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {'requests': 0, 'connections': 0})
+
+    def record_request(self, service):
+        with self._lock:
+            self._counts[service]['requests'] += 1
+
+    def record_connection(self, service):
+        with self._lock:
+            self._counts[service]['connections'] += 1
+
+    def snapshot(self):
+        """Return {service: {'requests', 'connections', 'reused'}}"""
+        with self._lock:
+            return {
+                service: dict(counts, reused=max(counts['requests'] - counts['connections'], 0))
+                for service, counts in self._counts.items()
+            }
+
+
+stats = ConnectionStats()
+
+
+def event_hooks(service):
+    """httpx event hooks that feed the connection counters for a service"""
+    def trace(event, info):
+        if event == 'connection.connect_tcp.complete':
+            stats.record_connection(service)
+
+    def on_request(request):
+        stats.record_request(service)
+        request.extensions['trace'] = trace
+
+    return {'request': [on_request]}
+
+
+def pool_limits(pool_size=POOL_SIZE):
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+class RetryTransport(httpx.HTTPTransport):
+    """Transport that retries rate-limited and temporarily unavailable responses with backoff"""
+
+    def __init__(self, max_retries=MAX_RETRIES, backoff=BACKOFF, **kwargs):
+        # httpx itself retries failed connection attempts
+        super().__init__(retries=max_retries, **kwargs)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def handle_request(self, request):
+        attempt = 0
+        while True:
+            response = super().handle_request(request)
+            retryable = response.status_code == 429 or request.method in IDEMPOTENT_METHODS
+            if response.status_code not in RETRY_STATUSES or not retryable or attempt >= self.max_retries:
+                return response
+
+            wait = _retry_after(response)
+            if wait is None:
+                wait = self.backoff * 2 ** attempt
+            response.close()
+            time.sleep(min(wait, MAX_BACKOFF))
+            attempt += 1
+
+
+def _retry_after(response):
+    """Seconds asked for by a Retry-After header, if it holds a number"""
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+
+def make_client(service, pool_size=POOL_SIZE, max_retries=MAX_RETRIES, timeout=TIMEOUT, **kwargs):
+    """Build a pooled, retrying httpx client whose traffic is counted under `service`"""
+    return httpx.Client(
+        transport=RetryTransport(max_retries=max_retries, limits=pool_limits(pool_size)),
+        timeout=timeout,
+        event_hooks=event_hooks(service),
+        **kwargs
+    )
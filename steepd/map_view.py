@@ -0,0 +1,72 @@
+# Map layers for the Streamlit frontend. The base map only depends on a coarse
+# bucket of the walker's position, so its Leaflet script stays byte-for-byte the
+# same between reruns and the browser keeps the map mounted; the live position
+# is passed separately as the view centre. Markers live in their own layer
+# whose script only changes with the rounded position and the place set, so
+# the browser only redraws them then. Nothing here may carry folium's random
+# element IDs (popups do), or every rerun would look like a change.
+# folium is imported on first use.
+
+MAP_ZOOM = 15
+CENTER_BUCKET = 0.005  # degrees, about 500 m; the map is re-mounted when the walker leaves a bucket
+POSITION_PRECISION = 4  # decimal places, about 10 m; finer GPS jitter keeps the same layer
+GEOJSON_THRESHOLD = 25  # more places than this are drawn as a single GeoJSON layer
+
+
+def center_bucket(lat, lon):
+    """Snap a position to the bucket the base map is centred on"""
+    return (
+        round(round(lat / CENTER_BUCKET) * CENTER_BUCKET, 6),
+        round(round(lon / CENTER_BUCKET) * CENTER_BUCKET, 6)
+    )
+
+
+def base_map(bucket):
+    """A map with no markers, centred on a bucket from center_bucket()"""
+    import folium
+    return folium.Map(location=list(bucket), zoom_start=MAP_ZOOM)
+
+
+def _geojson_places(places):
+    """All places as one GeoJSON layer of circle markers; much less script than a marker each"""
+    import folium
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [place['lon'], place['lat']]},
+            'properties': {'label': f"{place['name']} ({place['distance']}m away)"}
+        }
+        for place in places
+    ]
+    return folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        marker=folium.CircleMarker(radius=6, color='#2a81cb', fill=True, fill_opacity=0.8),
+        tooltip=folium.GeoJsonTooltip(fields=['label'], labels=False)
+    )
+
+
+def marker_layer(lat, lon, places):
+    """The walker's position and nearby places as one feature group"""
+    import folium
+    layer = folium.FeatureGroup(name='places')
+
+    # Add current location marker
+    folium.Marker(
+        [round(lat, POSITION_PRECISION), round(lon, POSITION_PRECISION)],
+        tooltip="You are here",
+        icon=folium.Icon(color='red', icon='user')
+    ).add_to(layer)
+
+    # Add nearby places
+    places = places or []
+    if len(places) > GEOJSON_THRESHOLD:
+        _geojson_places(places).add_to(layer)
+    else:
+        for place in places:
+            folium.Marker(
+                [place['lat'], place['lon']],
+                tooltip=f"{place['name']} ({place['distance']}m away)",
+                icon=folium.Icon(color='blue', icon='info-sign')
+            ).add_to(layer)
+
+    return layer
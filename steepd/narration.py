@@ -0,0 +1,179 @@
+import re
+import math
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from steepd import artifact_cache, city_pack, telemetry
+from steepd.clients import elevenlabs_client
+from steepd.single_flight import SingleFlight
+
+# Narration settings; these also key the artifact cache
+VOICE_ID = "21m00Tcm4TlvDq8ikWAM"  # Rachel's voice ID
+TTS_MODEL_ID = "eleven_monolingual_v1"
+AUDIO_FORMAT = "mp3_44100_128"
+DATA_SAVER_AUDIO_FORMAT = "mp3_22050_32"  # a quarter of the size, for phones on mobile data
+
+# Pipelined narration: streamed stories are voiced in sentence chunks while the
+# rest of the text is still being written. The first chunk is a single sentence
+# so playback starts early; later chunks are longer for fewer TTS requests.
+TTS_CHUNK_MIN_CHARS = 250
+TTS_WORKERS = 3
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+# Full stops after titles, abbreviations and initials don't end a sentence
+ABBREVIATION = re.compile(
+    r'\b(?:St|Mt|Ft|Mr|Mrs|Ms|Dr|Prof|Rev|Sr|Jr|Gen|Col|Capt|Lt|Sgt|Sq|No|Nos|vs|approx|ca?|[A-Z])\.$'
+)
+
+_flight = SingleFlight('audio')
+
+
+def audio_key(text, output_format=AUDIO_FORMAT):
+    """Identical text with the same voice settings always renders the same audio"""
+    return artifact_cache.artifact_key('audio', text, VOICE_ID, TTS_MODEL_ID, output_format)
+
+
+def get_cached_audio(text, output_format=AUDIO_FORMAT):
+    """Return the path of already rendered narration for text, or None"""
+    return artifact_cache.get_path(audio_key(text, output_format))
+
+
+def _render(text, key, client=None, timeout=None, output_format=AUDIO_FORMAT):
+    """Render text with ElevenLabs into the artifact cache under key"""
+    # A caller that finished just before this one may have cached it already
+    cached_audio = artifact_cache.get_path(key)
+    if cached_audio:
+        return cached_audio
+
+    # Generate audio using text_to_speech.convert
+    with telemetry.span('elevenlabs.tts', chars=len(text)):
+        audio = (client or elevenlabs_client()).text_to_speech.convert(
+            text=text,
+            voice_id=VOICE_ID,
+            model_id=TTS_MODEL_ID,
+            output_format=output_format,
+            request_options={'timeout_in_seconds': math.ceil(timeout)} if timeout else None
+        )
+        data = b"".join(audio)
+
+    # Save audio into the artifact cache
+    return artifact_cache.put_bytes(key, data, suffix=".mp3")
+
+
+def synthesize_audio(text, client=None, timeout=None, output_format=AUDIO_FORMAT):
+    """Render text with ElevenLabs into the artifact cache and return the file path"""
+    key = audio_key(text, output_format)
+    cached_audio = artifact_cache.get_path(key)
+    telemetry.tracer.cache('audio', hit=bool(cached_audio))
+    if cached_audio:
+        return cached_audio
+
+    # Packed narration is played in whatever format the pack was built with
+    packed = city_pack.find_audio(text)
+    if packed:
+        data, packed_format = packed
+        packed_key = audio_key(text, packed_format)
+        return artifact_cache.get_path(packed_key) or artifact_cache.put_bytes(packed_key, data, suffix=".mp3")
+
+    # Callers asking for the same narration at the same time share one request
+    return _flight.do(key, _render, text, key, client, timeout, output_format, timeout=timeout)
+
+
+def split_tts_chunks(text, min_chars=0, first_min_chars=None):
+    """Split off complete sentences from streamed text, grouped into chunks of at least min_chars
+
+    The first chunk needs only `first_min_chars`, if given. Returns the chunks
+    and the unfinished remainder.
+    """
+    chunks = []
+    chunk_start = 0
+    for match in SENTENCE_END.finditer(text):
+        if ABBREVIATION.search(text, max(match.start() - 8, 0), match.start()):
+            continue
+        end = match.end()
+        needed = first_min_chars if first_min_chars is not None and not chunks else min_chars
+        if end - chunk_start >= needed:
+            chunks.append(text[chunk_start:end].strip())
+            chunk_start = end
+    return chunks, text[chunk_start:]
+
+
+class PipelinedNarrator:
+    """Voice a story chunk by chunk while it is still being generated"""
+
+    def __init__(self, output_format=AUDIO_FORMAT, client=None):
+        self._client = client
+        self._output_format = output_format
+        self._executor = ThreadPoolExecutor(max_workers=TTS_WORKERS)
+        self._buffer = ""
+        self._futures = []
+        self._delivered = 0
+
+    def _submit(self, chunk):
+        # Copy the context so chunk requests are traced under the calling stage
+        self._futures.append(self._executor.submit(contextvars.copy_context().run, self._synthesize, chunk))
+
+    def _synthesize(self, chunk):
+        try:
+            return synthesize_audio(chunk, self._client, output_format=self._output_format)
+        except Exception:
+            return None  # A missing chunk only leaves a gap; the full text is still shown
+
+    def feed(self, text):
+        """Add newly generated text, sending any completed chunks to TTS"""
+        self._buffer += text
+        # Only the story's very first chunk is a single sentence
+        first_min_chars = TTS_CHUNK_MIN_CHARS if self._futures else 0
+        chunks, self._buffer = split_tts_chunks(self._buffer, TTS_CHUNK_MIN_CHARS, first_min_chars)
+        for chunk in chunks:
+            self._submit(chunk)
+
+    def ready(self):
+        """Return audio paths for chunks finished so far, in story order"""
+        paths = []
+        while self._delivered < len(self._futures) and self._futures[self._delivered].done():
+            path = self._futures[self._delivered].result()
+            if path:
+                paths.append(path)
+            self._delivered += 1
+        return paths
+
+    def finish(self, timeout=None):
+        """Voice the remaining text and wait for every outstanding chunk
+
+        Raises TimeoutError if the chunks aren't all ready within timeout seconds.
+        """
+        if self._buffer.strip():
+            self._submit(self._buffer.strip())
+            self._buffer = ""
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        paths = []
+        try:
+            while self._delivered < len(self._futures):
+                wait = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                path = self._futures[self._delivered].result(timeout=wait)
+                if path:
+                    paths.append(path)
+                self._delivered += 1
+        finally:
+            self.close()
+        return paths
+
+    def close(self):
+        """Stop voicing: chunks not yet sent to TTS are cancelled and the worker threads released"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def combine(self, story):
+        """Join all chunks into one MP3 cached as the full story's narration"""
+        paths = [future.result() for future in self._futures]
+        if not paths or not all(paths):
+            return None
+
+        # MP3 frames are self-contained, so same-format files can simply be concatenated
+        data = b""
+        for path in paths:
+            with open(path, 'rb') as f:
+                data += f.read()
+
+        return artifact_cache.put_bytes(audio_key(story, self._output_format), data, suffix=".mp3")
@@ -0,0 +1,197 @@
+import time
+
+from steepd import artifact_cache, city_pack, telemetry
+from steepd.clients import openai_client
+from steepd.geocoding import reverse_geocode
+from steepd.single_flight import SingleFlight
+
+# Story settings; these also key the artifact cache, so bump PROMPT_VERSION
+# whenever the story prompt changes
+STORY_MODEL = "gpt-4"
+PROMPT_VERSION = 1
+
+_flight = SingleFlight('story')
+
+
+def story_request(place_info, selected_place=None):
+    """Build the OpenAI request and artifact-cache key for a place's narrative"""
+    # Get location context
+    location_context = ""
+    if selected_place and 'lat' in selected_place and 'lon' in selected_place:
+        try:
+            address = reverse_geocode(selected_place['lat'], selected_place['lon'])
+
+            if address:
+                area = address.get('suburb') or address.get('neighbourhood') or address.get('district')
+                city = address.get('city') or address.get('town', 'London')
+                location_context = f"The visitor is currently in {area}, {city}"
+        except Exception:
+            location_context = "The visitor is currently in London"
+
+    # Check if this is a memorial
+    is_memorial = False
+    memorial_context = ""
+    if selected_place:
+        if selected_place.get('type') == 'memorial' or 'memorial' in selected_place.get('name', '').lower():
+            is_memorial = True
+            memorial_context = f"""
+            Important: The visitor is standing at the {selected_place['name']} memorial/monument in {location_context}.
+            Frame the story from this perspective - they are AT the memorial, not reading about the person in abstract.
+            Connect the person's story to why they are memorialized in THIS specific location.
+            """
+
+    prompt = f"""
+    Transform the following Wikipedia information about {place_info['title']} into an engaging, 
+    narrative-driven story that someone would enjoy hearing while walking past this location. 
+
+    {location_context}
+    {memorial_context}
+
+    Make it conversational, interesting, and about 2-3 minutes of speaking time (roughly 300-400 words).
+    Include interesting facts, historical context, or amusing anecdotes if available.
+    Write it as if you're a knowledgeable local guide talking to a friend who is standing right at this spot.
+
+    If this is about a person who has a memorial here, explain their connection to this area and why they're commemorated here.
+
+    Source information:
+    {place_info['content']}
+
+    Create an engaging narrative story that's relevant to someone standing at this location:
+    """
+
+    # Stories are cached per article revision and framing
+    revision = place_info.get('revision') or artifact_cache.artifact_key(place_info['content'])
+    story_key = artifact_cache.artifact_key(
+        'story', place_info['title'], revision, PROMPT_VERSION, STORY_MODEL, location_context, memorial_context
+    )
+
+    request = dict(
+        model=STORY_MODEL,
+        messages=[
+            {"role": "system",
+             "content": "You are a master storyteller who creates engaging narratives about places. You always consider the visitor's current location and frame stories appropriately."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.8,
+        max_tokens=500
+    )
+
+    return request, story_key
+
+
+def _openai(timeout=None):
+    """The shared OpenAI client, with a shorter request timeout if one is given"""
+    client = openai_client()
+    return client.with_options(timeout=timeout) if timeout else client
+
+
+def _complete(request, story_key, timeout=None):
+    """Generate a story with one blocking completion and cache it"""
+    # A caller that finished just before this one may have cached it already
+    story = artifact_cache.get_text(story_key)
+    if story:
+        return story
+
+    with telemetry.span('openai.story', model=STORY_MODEL, stream=False):
+        response = _openai(timeout).chat.completions.create(**request)
+
+    story = response.choices[0].message.content
+    if story:
+        artifact_cache.put_text(story_key, story)
+    return story
+
+
+def generate_story(place_info, selected_place=None, timeout=None):
+    """Return the narrative for a place, from a city pack, the artifact cache or a new completion"""
+    packed_story = city_pack.find_story(place_info)
+    if packed_story:
+        return packed_story
+
+    request, story_key = story_request(place_info, selected_place)
+
+    # Reuse a story already generated for this article revision and framing
+    cached_story = artifact_cache.get_text(story_key)
+    telemetry.tracer.cache('story', hit=bool(cached_story))
+    if cached_story:
+        return cached_story
+
+    # Callers asking for the same story at the same time share one completion
+    return _flight.do(story_key, _complete, request, story_key, timeout, timeout=timeout)
+
+
+def get_cached_story(place_info, selected_place=None):
+    """Return the already generated narrative for a place, or None"""
+    packed_story = city_pack.find_story(place_info)
+    if packed_story:
+        return packed_story
+
+    _, story_key = story_request(place_info, selected_place)
+    return artifact_cache.get_text(story_key)
+
+
+def _stream_completion(request, story_key, timeout=None):
+    """Yield a story as OpenAI streams it and return the whole text"""
+    parts = []
+    try:
+        with telemetry.span('openai.story', model=STORY_MODEL, stream=True) as attributes:
+            started = time.perf_counter()
+            response = _openai(timeout).chat.completions.create(**request, stream=True)
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        attributes['first_token_s'] = round(time.perf_counter() - started, 3)
+                    parts.append(delta)
+                    with telemetry.tracer.detached():
+                        yield delta
+    except Exception:
+        if parts:
+            raise  # Part of the story is already out, so don't start it over
+
+        # Streaming unavailable; fall back to a single blocking completion
+        story = _complete(request, story_key, timeout)
+        if story:
+            yield story
+        return story
+
+    story = "".join(parts)
+    if story:
+        artifact_cache.put_text(story_key, story)
+    return story
+
+
+def stream_story(place_info, selected_place=None, timeout=None):
+    """Yield the narrative piece by piece as OpenAI generates it; errors are raised"""
+    packed_story = city_pack.find_story(place_info)
+    if packed_story:
+        yield packed_story
+        return
+
+    request, story_key = story_request(place_info, selected_place)
+
+    cached_story = artifact_cache.get_text(story_key)
+    telemetry.tracer.cache('story', hit=bool(cached_story))
+    if cached_story:
+        yield cached_story
+        return
+
+    future, leader = _flight.begin(story_key)
+    if not leader:
+        # The same story is already being written for someone else; wait for it whole
+        story = future.result(timeout=timeout)
+        if story:
+            yield story
+        return
+
+    try:
+        story = yield from _stream_completion(request, story_key, timeout)
+    except GeneratorExit:
+        # The reader stopped, usually at its deadline; don't leave the others waiting
+        _flight.finish(story_key, error=TimeoutError("story generation was abandoned"))
+        raise
+    except BaseException as e:
+        _flight.finish(story_key, error=e)
+        raise
+    _flight.finish(story_key, story)
@@ -0,0 +1,305 @@
+import os
+
+from steepd import city_pack, poi_index, telemetry, wiki_resolver
+from steepd.clients import overpass_client, wikipedia_client
+from steepd.content_store import wiki_payloads, wiki_misses, place_key
+from steepd.geocoding import reverse_geocode
+from steepd.single_flight import SingleFlight
+
+OVERPASS_URL = os.environ.get("STEEPD_OVERPASS_URL", "http://overpass-api.de/api/interpreter")
+
+# Wikipedia verification limits for get_nearby_places
+MAX_CANDIDATES = 20  # Overpass candidates checked per refresh
+MAX_VERIFIED_PLACES = 8  # Stop once this many places have articles
+VERIFY_BATCH_SIZE = 10  # Candidates sent to Wikipedia together
+SEARCH_RADIUS = 1000  # metres
+
+# Adaptive search: widen the search ring by ring until enough places have
+# articles, checking the likeliest candidates (by their OSM tags) first
+ADAPTIVE_RINGS = (250, 500, 1000, 2000)  # metres
+ADAPTIVE_TARGET = 5  # verified places wanted
+
+# Spans that stand for one upstream request each
+UPSTREAM_SPANS = ('overpass', 'nominatim.reverse', 'wikipedia.query', 'wikipedia.geosearch', 'wikidata.sitelinks')
+
+_flight = SingleFlight('wikipedia')
+
+
+def _place_area(location):
+    """Reverse-geocode a coordinate to its (area, city), (None, None) if unknown, or None if the lookup failed"""
+    if not location:
+        return None, None
+    try:
+        address = reverse_geocode(location[0], location[1])
+    except Exception:
+        return None
+    return wiki_resolver.area_and_city(address) if address else (None, None)
+
+
+def verify_wikipedia_articles(places, center=None, radius=SEARCH_RADIUS):
+    """Fetch verified Wikipedia articles for several (name, location, tags) places at once
+
+    Returns an article payload or None per place. Places whose OSM tags name
+    their article are resolved directly. Titles for the rest go to Wikipedia in
+    a few batched requests, with articles geotagged near `center` under the
+    same name tried first.
+    """
+    results = [None] * len(places)
+
+    # Places verified earlier, or packed for offline use, are served locally
+    pending = []
+    for i, (place_name, location, _) in enumerate(places):
+        key = place_key(place_name, location)
+        cached = wiki_payloads.get(key)
+        if not cached:
+            cached = city_pack.find_article(place_name, location)
+            if cached:
+                wiki_payloads.put(key, cached)
+        if cached:
+            results[i] = cached
+        elif not wiki_misses.get(key):
+            pending.append(i)
+        telemetry.tracer.cache('wikipedia', hit=i not in pending)
+
+    if not pending:
+        return results
+
+    wiki_client = wikipedia_client()
+
+    # Tagged places skip reverse geocoding and title guessing entirely
+    try:
+        tagged = wiki_resolver.resolve_tagged(wiki_client, [places[i][2] for i in pending])
+    except Exception:
+        tagged = [None] * len(pending)
+
+    for i, wiki_info in zip(pending, tagged):
+        if wiki_info:
+            wiki_payloads.put(place_key(places[i][0], places[i][1]), wiki_info)
+            results[i] = wiki_info
+    pending = [i for i in pending if results[i] is None]
+
+    if not pending:
+        return results
+
+    try:
+        geo_pages = wiki_resolver.geosearch(wiki_client, center[0], center[1], radius) if center else []
+    except Exception:
+        geo_pages = []  # Fall back to guessing titles
+
+    lookups = []
+    incomplete = set()  # places looked up without their area, whose misses aren't final
+    for i in pending:
+        place_name, location, _ = places[i]
+        place_area = _place_area(location)
+        if place_area is None:
+            incomplete.add(i)
+        area, city = place_area or (None, None)
+        preferred = wiki_resolver.geotagged_title(place_name, location[0], location[1], geo_pages) if location else None
+        lookups.append({'name': place_name, 'area': area, 'city': city, 'location': location, 'preferred': preferred})
+
+    try:
+        resolved = wiki_resolver.resolve_articles(wiki_client, lookups)
+    except Exception:
+        return results  # Silently fail - try again next time
+
+    for i, wiki_info in zip(pending, resolved):
+        key = place_key(places[i][0], places[i][1])
+        if wiki_info:
+            wiki_payloads.put(key, wiki_info)
+        elif i not in incomplete:
+            wiki_misses.put(key, True)
+        results[i] = wiki_info
+
+    return results
+
+
+def get_wikipedia_info(place_name, location=None, tags=None):
+    """Fetch information about a place from Wikipedia with strict location verification"""
+    lookup = lambda: verify_wikipedia_articles([(place_name, location, tags)])[0]
+    key = place_key(place_name, location)
+    if wiki_payloads.get(key) or wiki_misses.get(key) or city_pack.find_article(place_name, location):
+        return lookup()  # Answered locally without any requests
+
+    # Lookups for the same place at the same time share one set of requests
+    return _flight.do(key, lookup)
+
+
+def fetch_place_elements(lat, lon, radius):
+    """Get raw OSM elements for notable places, from a city pack or the local POI index when one covers the area"""
+    for index in (city_pack.default_pack(), poi_index.default_index()):
+        if index and index.covers(lat, lon, radius):
+            try:
+                return index.query_radius(lat, lon, radius)
+            except Exception:
+                pass  # Fall back to Overpass
+
+    query = poi_index.overpass_query(f"around:{radius},{lat},{lon}")
+    with telemetry.span('overpass', radius=radius):
+        response = overpass_client().get(OVERPASS_URL, params={'data': query})
+
+    if response.status_code == 200:
+        return response.json().get('elements', [])
+    return []
+
+
+def _tile_envelope(tiles):
+    """One (south, west, north, east) box around grid tiles"""
+    bboxes = [poi_index.tile_bbox(tile) for tile in tiles]
+    return (
+        min(bbox[0] for bbox in bboxes), min(bbox[1] for bbox in bboxes),
+        max(bbox[2] for bbox in bboxes), max(bbox[3] for bbox in bboxes)
+    )
+
+
+def _sort_into_tiles(elements, by_tile):
+    for element in elements:
+        point = element if 'lat' in element else element.get('center')
+        if point:
+            tile = poi_index.tile_of(point['lat'], point['lon'])
+            if tile in by_tile:
+                by_tile[tile].append(element)
+
+
+def fetch_tile_elements(tiles):
+    """Get raw OSM elements for grid tiles, keyed by tile"""
+    by_tile = {}
+
+    # Tiles inside a city pack are served from it; only the rest go further
+    pack = city_pack.default_pack()
+    packed = [tile for tile in tiles if pack and pack.covers_bbox(poi_index.tile_bbox(tile))]
+    if packed:
+        packed_tiles = {tile: [] for tile in packed}
+        _sort_into_tiles(pack.query_bbox(_tile_envelope(packed)), packed_tiles)
+        by_tile.update(packed_tiles)
+        tiles = [tile for tile in tiles if tile not in packed_tiles]
+    if not tiles:
+        return by_tile
+
+    # One box around the other tiles; elements are sorted into tiles afterwards
+    envelope = _tile_envelope(tiles)
+
+    elements = None
+    index = poi_index.default_index()
+    if index and index.covers_bbox(envelope):
+        try:
+            elements = index.query_bbox(envelope)
+        except Exception:
+            pass  # Fall back to Overpass
+
+    if elements is None:
+        query = poi_index.overpass_query(",".join(str(round(value, 6)) for value in envelope))
+        with telemetry.span('overpass', tiles=len(tiles)):
+            response = overpass_client().get(OVERPASS_URL, params={'data': query})
+            response.raise_for_status()
+            elements = response.json().get('elements', [])
+
+    fetched_tiles = {tile: [] for tile in tiles}
+    _sort_into_tiles(elements, fetched_tiles)
+    by_tile.update(fetched_tiles)
+    return by_tile
+
+
+def nearby_candidates(lat, lon, radius=SEARCH_RADIUS, elements=None):
+    """Rank notable OSM places around a point, nearest first; Overpass errors are raised
+
+    Pass `elements` to rank candidates that were already fetched instead of querying again.
+    """
+    if elements is None:
+        elements = fetch_place_elements(lat, lon, radius)
+
+    # Nearest candidates first, commercial chains removed
+    return poi_index.rank_places(elements, lat, lon, limit=MAX_CANDIDATES, radius=radius)
+
+
+def _mark_verified(place, wiki_info):
+    place['has_wiki'] = True
+    place['wiki_title'] = wiki_info['title']
+    place['wiki_url'] = wiki_info['url']
+
+
+def verify_places(candidates, lat, lon, radius=SEARCH_RADIUS):
+    """Keep the candidates that have Wikipedia articles, marking each with its title and URL"""
+    places_with_wiki = []
+
+    with telemetry.span('nearby.verify', candidates=len(candidates)):
+        # Check candidates nearest first, a batch at a time, until enough have articles
+        for start in range(0, len(candidates), VERIFY_BATCH_SIZE):
+            batch = candidates[start:start + VERIFY_BATCH_SIZE]
+            articles = verify_wikipedia_articles(
+                [(place['name'], (place['lat'], place['lon']), place.get('tags')) for place in batch],
+                center=(lat, lon),
+                radius=radius
+            )
+
+            for place, wiki_info in zip(batch, articles):
+                if wiki_info:
+                    _mark_verified(place, wiki_info)
+                    places_with_wiki.append(place)
+
+            # Stop after finding enough places with Wikipedia articles
+            if len(places_with_wiki) >= MAX_VERIFIED_PLACES:
+                del places_with_wiki[MAX_VERIFIED_PLACES:]
+                break
+
+    return places_with_wiki
+
+
+def get_nearby_places(lat, lon, radius=SEARCH_RADIUS, elements=None):
+    """Get nearby notable places from OpenStreetMap data that have Wikipedia articles"""
+    return verify_places(nearby_candidates(lat, lon, radius, elements), lat, lon, radius)
+
+
+def adaptive_nearby_places(lat, lon, target=ADAPTIVE_TARGET, rings=ADAPTIVE_RINGS, budget=MAX_CANDIDATES,
+                           elements=None):
+    """Find places with articles by widening the search ring by ring until `target` are found
+
+    Candidates are verified ring by ring, and within a ring in order of their
+    tag prior (tagged with an article or Wikidata item, historic, memorial,
+    ...), nearest first among equals; at most `budget` are checked in all.
+    The first ring is fetched and verified on its own. Only if it falls short
+    is the widest ring fetched, and the rest of the rings verified from it in
+    shared batches. Pass `elements` covering the widest ring to skip fetching.
+    Returns the places nearest first and a report of the search: rings
+    searched, final radius, candidates seen and checked, and upstream requests
+    made.
+    """
+    found = []
+    checked = set()
+    report = {'rings': 0, 'radius': None, 'candidates': 0, 'checked': 0}
+    stages = [rings] if elements is not None else [rings[:1], rings[1:]]
+
+    with telemetry.tracer.count_spans() as calls, telemetry.span('nearby.adaptive', target=target):
+        for stage in stages:
+            if not stage or len(found) >= target or report['checked'] >= budget:
+                break
+            stage_elements = elements if elements is not None else fetch_place_elements(lat, lon, stage[-1])
+            ring_of = lambda place: next((ring for ring in stage if place['distance'] <= ring), stage[-1])
+            candidates = [
+                place for place in poi_index.rank_places(stage_elements, lat, lon, radius=stage[-1])
+                if place['name'] not in checked
+            ]
+            candidates.sort(key=lambda place: (ring_of(place), -poi_index.prior_score(place['tags']), place['distance']))
+            report['candidates'] += len(candidates)
+            report['radius'] = report['radius'] or stage[0]
+
+            for start in range(0, len(candidates), VERIFY_BATCH_SIZE):
+                if len(found) >= target or report['checked'] >= budget:
+                    break
+                batch = candidates[start:start + min(VERIFY_BATCH_SIZE, budget - report['checked'])]
+                articles = verify_wikipedia_articles(
+                    [(place['name'], (place['lat'], place['lon']), place.get('tags')) for place in batch],
+                    center=(lat, lon),
+                    radius=ring_of(batch[-1])
+                )
+                for place, wiki_info in zip(batch, articles):
+                    checked.add(place['name'])
+                    if wiki_info:
+                        _mark_verified(place, wiki_info)
+                        found.append(place)
+                report['checked'] += len(batch)
+                report['radius'] = max(report['radius'], ring_of(batch[-1]))
+
+    report['rings'] = rings.index(report['radius']) + 1 if report['radius'] else 0
+    report['upstream_calls'] = sum(calls[name] for name in UPSTREAM_SPANS)
+    found.sort(key=lambda place: place['distance'])
+    return found[:MAX_VERIFIED_PLACES], report
@@ -0,0 +1,402 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+
+import numpy as np
+
+# Local index of points of interest built from an OSM extract, so nearby-place
+# lookups don't have to go to the public Overpass API. Places are stored in a
+# SQLite table with an R*Tree spatial index; see tools/build_poi_index.py.
+
+POI_INDEX_PATH = os.environ.get(
+    "STEEPD_POI_INDEX",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "poi_index.sqlite3")
+)
+
+EARTH_RADIUS_M = 6371008.8
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+
+# Tag filters for notable places: (element types, key, value regex or None for any value).
+# Both the live Overpass query and the offline index are built from this table.
+POI_FILTERS = [
+    (('node', 'way', 'relation'), 'historic', None),
+    (('node', 'way', 'relation'), 'tourism', None),
+    (('node', 'way', 'relation'), 'amenity', 'place_of_worship|theatre|arts_centre|library|community_centre'),
+    (('node', 'way', 'relation'), 'leisure', 'park|garden'),
+    (('node', 'way'), 'building', 'church|theatre|museum'),
+    (('node', 'way'), 'memorial', None),
+    (('node',), 'man_made', 'monument|memorial'),
+]
+
+# Commercial chains to exclude
+EXCLUDE_TERMS = [
+    'premier inn', 'travelodge', 'holiday inn', 'ibis', 'hilton', 'marriott',
+    'tesco', 'sainsbury', 'asda', 'lidl', 'aldi', 'co-op', 'waitrose',
+    'mcdonalds', 'burger king', 'kfc', 'subway', 'starbucks', 'costa',
+    'boots', 'superdrug', 'lloyds pharmacy', 'hsbc', 'barclays', 'natwest',
+    'santander', 'halifax', 'nationwide'
+]
+
+# One alternation instead of a substring scan per term
+EXCLUDE_PATTERN = re.compile("|".join(re.escape(term) for term in EXCLUDE_TERMS))
+
+_FILTER_PATTERNS = [
+    (types, key, re.compile(pattern) if pattern else None) for types, key, pattern in POI_FILTERS
+]
+
+
+def overpass_query(area):
+    """Build the Overpass query for notable places within an area filter
+
+    area is an Overpass spatial filter body, e.g. "around:1000,51.5,-0.12" or a
+    "south,west,north,east" bounding box, or a list of them to query in one go.
+    """
+    areas = [area] if isinstance(area, str) else area
+    clauses = []
+    for area in areas:
+        for element_type in ('node', 'way', 'relation'):
+            for types, key, pattern in POI_FILTERS:
+                if element_type not in types:
+                    continue
+                tag_filter = f'["{key}"~"{pattern}"]' if pattern else f'["{key}"]'
+                clauses.append(f'  {element_type}["name"]{tag_filter}({area});')
+
+    body = "\n".join(clauses)
+    return f"[out:json];\n(\n{body}\n);\nout center;"
+
+
+def matches_filters(element_type, tags):
+    """Check an OSM element against the notable-place tag filters"""
+    if 'name' not in tags:
+        return False
+    for types, key, pattern in _FILTER_PATTERNS:
+        if element_type not in types or key not in tags:
+            continue
+        # Overpass "~" filters are unanchored regex searches
+        if pattern is None or pattern.search(tags[key]):
+            return True
+    return False
+
+
+def is_excluded(name):
+    """Check whether a place name belongs to a commercial chain"""
+    return EXCLUDE_PATTERN.search(name.lower()) is not None
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def distances_m(lat, lon, lats, lons):
+    """Distances in metres from one point to arrays of points
+
+    Uses the WGS84 radii of curvature at the midpoint latitude, which agrees with
+    geopy's geodesic to well under a metre over walking distances.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+
+    mid = np.radians((lats + lat) / 2)
+    sin2 = np.sin(mid) ** 2
+    w = np.sqrt(1 - WGS84_E2 * sin2)
+    meridional = WGS84_A * (1 - WGS84_E2) / w ** 3
+    prime_vertical = WGS84_A / w
+
+    dy = meridional * np.radians(lats - lat)
+    dx = prime_vertical * np.cos(mid) * np.radians((lons - lon + 180) % 360 - 180)
+    return np.hypot(dx, dy)
+
+
+def place_type(tags):
+    """Classify a place from its OSM tags for story context"""
+    if 'memorial' in tags or 'man_made' in tags:
+        return 'memorial'
+    elif 'amenity' in tags:
+        return tags['amenity']
+    elif 'tourism' in tags:
+        return tags['tourism']
+    elif 'leisure' in tags:
+        return tags['leisure']
+    elif 'historic' in tags:
+        return 'historic'
+    elif 'building' in tags:
+        return tags['building']
+    return None
+
+
+# Cheap prior for how likely a place is to have its own Wikipedia article,
+# from its OSM tags alone: (key, value regex or None for any value, weight)
+PRIOR_WEIGHTS = [
+    ('wikipedia', None, 4.0),
+    ('wikidata', None, 3.0),
+    ('heritage', None, 2.0),
+    ('historic', None, 1.5),
+    ('memorial', None, 1.0),
+    ('man_made', 'monument|memorial', 1.0),
+    ('tourism', 'museum|attraction|gallery|artwork|viewpoint', 1.0),
+    ('amenity', 'place_of_worship|theatre|arts_centre', 0.5),
+]
+
+_PRIOR_PATTERNS = [
+    (key, re.compile(pattern) if pattern else None, weight) for key, pattern, weight in PRIOR_WEIGHTS
+]
+
+
+def prior_score(tags):
+    """Score a place's tags by how likely it is to have an article; higher is likelier"""
+    return sum(
+        weight for key, pattern, weight in _PRIOR_PATTERNS
+        if key in tags and (pattern is None or pattern.search(tags[key]))
+    )
+
+
+def rank_places(elements, lat, lon, limit=None, radius=None):
+    """Turn Overpass-style elements into place dicts, nearest first
+
+    Names are de-duplicated (first occurrence wins) and commercial chains are
+    dropped. Places further than `radius` metres are left out, and only the
+    nearest `limit` places are built and sorted.
+    """
+    candidates = []
+    lats = []
+    lons = []
+    seen_names = set()
+
+    for element in elements:
+        tags = element.get('tags', {})
+        name = tags.get('name')
+
+        if not name or name in seen_names:
+            continue
+
+        # Skip commercial chains
+        if is_excluded(name):
+            continue
+
+        seen_names.add(name)
+
+        # Get coordinates
+        if 'lat' in element and 'lon' in element:
+            point = element
+        elif 'center' in element:
+            point = element['center']
+        else:
+            continue
+
+        candidates.append(tags)
+        lats.append(point['lat'])
+        lons.append(point['lon'])
+
+    if not candidates:
+        return []
+
+    distances = distances_m(lat, lon, lats, lons).astype(np.int64)
+
+    if radius is not None:
+        within = np.flatnonzero(distances <= radius)
+        candidates = [candidates[i] for i in within]
+        lats = [lats[i] for i in within]
+        lons = [lons[i] for i in within]
+        distances = distances[within]
+
+    # Select the nearest `limit` without sorting everything; ties keep element order
+    if limit is not None and limit < len(distances):
+        if limit <= 0:
+            return []
+        cutoff = np.partition(distances, limit - 1)[limit - 1]
+        selected = np.flatnonzero(distances <= cutoff)
+        order = selected[np.argsort(distances[selected], kind='stable')][:limit]
+    else:
+        order = np.argsort(distances, kind='stable')
+
+    places = []
+    for i in order:
+        tags = candidates[i]
+        place_info = {
+            'name': tags['name'],
+            'lat': lats[i],
+            'lon': lons[i],
+            'distance': int(distances[i]),
+            'tags': tags  # Store all tags for context
+        }
+
+        # Add type information for context
+        kind = place_type(tags)
+        if kind:
+            place_info['type'] = kind
+
+        places.append(place_info)
+    return places
+
+
+class PoiIndex:
+    """Radius queries over a local SQLite/R*Tree POI index"""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        self.bounds = json.loads(meta['bounds']) if 'bounds' in meta else None
+        self.source = meta.get('source')
+
+    def covers(self, lat, lon, radius):
+        """Check whether a search circle lies entirely inside the indexed extract"""
+        return self.covers_bbox(_radius_bbox(lat, lon, radius))
+
+    def covers_bbox(self, bbox):
+        """Check whether a (south, west, north, east) box lies entirely inside the indexed extract"""
+        if not self.bounds:
+            return False
+        south, west, north, east = self.bounds
+        return south <= bbox[0] and west <= bbox[1] and bbox[2] <= north and bbox[3] <= east
+
+    def query_bbox(self, bbox):
+        """Return Overpass-style elements inside a (south, west, north, east) box"""
+        south, west, north, east = bbox
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT p.osm_type, p.osm_id, p.lat, p.lon, p.tags FROM pois_rtree r "
+                "JOIN pois p ON p.id = r.id "
+                "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?",
+                (south, north, west, east)
+            ).fetchall()
+
+        return [
+            {'type': osm_type, 'id': osm_id, 'lat': elem_lat, 'lon': elem_lon, 'tags': json.loads(tags)}
+            for osm_type, osm_id, elem_lat, elem_lon, tags in rows
+        ]
+
+    def query_radius(self, lat, lon, radius):
+        """Return Overpass-style elements within radius metres of a point"""
+        # The R*Tree narrows to a bounding box; trim its corners
+        return [
+            element for element in self.query_bbox(_radius_bbox(lat, lon, radius))
+            if haversine_m(lat, lon, element['lat'], element['lon']) <= radius
+        ]
+
+
+def _radius_bbox(lat, lon, radius):
+    """(south, west, north, east) box enclosing a circle of radius metres"""
+    dlat = math.degrees(radius / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+# Fixed lat/lon grid used to fetch and keep candidates tile by tile as the user walks
+TILE_DEG = 0.01  # ~1.1 km north-south
+
+
+def tile_of(lat, lon):
+    """Grid tile containing a point"""
+    return math.floor(lat / TILE_DEG), math.floor(lon / TILE_DEG)
+
+
+def tile_bbox(tile):
+    """(south, west, north, east) box of a grid tile"""
+    row, col = tile
+    return row * TILE_DEG, col * TILE_DEG, (row + 1) * TILE_DEG, (col + 1) * TILE_DEG
+
+
+def tiles_around(lat, lon, radius):
+    """Grid tiles overlapping the box around a circle of radius metres"""
+    south, west, north, east = _radius_bbox(lat, lon, radius)
+    first_row, first_col = tile_of(south, west)
+    last_row, last_col = tile_of(north, east)
+    return [
+        (row, col)
+        for row in range(first_row, last_row + 1)
+        for col in range(first_col, last_col + 1)
+    ]
+
+
+INDEX_SCHEMA = """
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE pois (
+        id INTEGER PRIMARY KEY,
+        osm_type TEXT NOT NULL,
+        osm_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        lat REAL NOT NULL,
+        lon REAL NOT NULL,
+        tags TEXT NOT NULL,
+        UNIQUE (osm_type, osm_id)
+    );
+    CREATE VIRTUAL TABLE pois_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+
+def insert_poi(db, osm_type, osm_id, lat, lon, tags):
+    """Add one place to an index database; returns its row id, or None if it is already there"""
+    cursor = db.execute(
+        "INSERT OR IGNORE INTO pois (osm_type, osm_id, name, lat, lon, tags) VALUES (?, ?, ?, ?, ?, ?)",
+        (osm_type, osm_id, tags['name'], lat, lon, json.dumps(tags))
+    )
+    if not cursor.rowcount:
+        return None
+    db.execute("INSERT INTO pois_rtree VALUES (?, ?, ?, ?, ?)", (cursor.lastrowid, lat, lat, lon, lon))
+    return cursor.lastrowid
+
+
+def create_index(path, elements, bounds, source=""):
+    """Write an index from Overpass-style elements, applying the place filters"""
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    db = sqlite3.connect(path)
+    db.executescript(INDEX_SCHEMA)
+
+    count = 0
+    for element in elements:
+        element_type = element.get('type', 'node')
+        tags = element.get('tags', {})
+        if not matches_filters(element_type, tags) or is_excluded(tags['name']):
+            continue
+
+        if 'lat' in element and 'lon' in element:
+            lat, lon = element['lat'], element['lon']
+        elif 'center' in element:
+            lat, lon = element['center']['lat'], element['center']['lon']
+        else:
+            continue
+
+        if insert_poi(db, element_type, element.get('id', 0), lat, lon, tags):
+            count += 1
+
+    db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+        ('bounds', json.dumps(list(bounds))),
+        ('source', source),
+    ])
+    db.commit()
+    db.close()
+    return count
+
+
+_default_index = None
+_default_index_loaded = False
+_default_index_lock = threading.Lock()
+
+
+def default_index():
+    """Open the configured POI index once per process, or return None if there isn't one"""
+    global _default_index, _default_index_loaded
+    with _default_index_lock:
+        if not _default_index_loaded:
+            _default_index_loaded = True
+            if os.path.exists(POI_INDEX_PATH):
+                try:
+                    _default_index = PoiIndex(POI_INDEX_PATH)
+                except sqlite3.Error:
+                    _default_index = None
+        return _default_index
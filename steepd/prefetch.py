@@ -0,0 +1,110 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from steepd.poi_index import EARTH_RADIUS_M
+
+# Predictive prefetch: estimate where the walker is heading from successive
+# location fixes and warm the stories for the places they will reach next.
+
+MIN_SPEED = 0.3  # m/s; slower than this counts as standing still
+MAX_SPEED = 4.0  # m/s; faster is GPS noise or not walking
+MIN_TRACK_DISTANCE = 15  # metres moved before a heading is trusted
+TRACK_WINDOW = 90  # seconds of fixes used for the estimate
+CORRIDOR_WIDTH = 150  # metres either side of the walking line
+MAX_ARRIVAL_TIME = 15 * 60  # seconds; further places aren't worth warming yet
+
+
+def estimate_motion(fixes):
+    """Estimate (speed m/s, heading degrees from north) from (time, lat, lon, speed, heading) fixes
+
+    The browser's own speed and heading are used when the latest fix has them;
+    otherwise they are derived from the displacement over the recent window.
+    Returns None while the walker is standing still or the track is too short.
+    """
+    if not fixes:
+        return None
+
+    latest = fixes[-1]
+    if latest[3] is not None and latest[4] is not None:
+        speed, heading = latest[3], latest[4]
+    else:
+        recent = [fix for fix in fixes if latest[0] - fix[0] <= TRACK_WINDOW]
+        first = recent[0]
+        elapsed = latest[0] - first[0]
+        if elapsed <= 0:
+            return None
+
+        dy, dx = _offset_m(first[1], first[2], latest[1], latest[2])
+        distance = math.hypot(dx, dy)
+        if distance < MIN_TRACK_DISTANCE:
+            return None
+
+        speed = distance / elapsed
+        heading = math.degrees(math.atan2(dx, dy)) % 360
+
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        return None
+    return speed, heading
+
+
+def _offset_m(lat, lon, to_lat, to_lon):
+    """(north, east) offset in metres between two nearby points"""
+    north = math.radians(to_lat - lat) * EARTH_RADIUS_M
+    east = math.radians(to_lon - lon) * EARTH_RADIUS_M * math.cos(math.radians((lat + to_lat) / 2))
+    return north, east
+
+
+def rank_by_arrival(places, lat, lon, speed, heading):
+    """Order places ahead of the walker by estimated arrival time in seconds
+
+    Returns (seconds, place) pairs for places within CORRIDOR_WIDTH of the
+    walking line and less than MAX_ARRIVAL_TIME away.
+    """
+    heading_rad = math.radians(heading)
+    direction = (math.cos(heading_rad), math.sin(heading_rad))  # (north, east)
+
+    upcoming = []
+    for place in places:
+        north, east = _offset_m(lat, lon, place['lat'], place['lon'])
+        along = north * direction[0] + east * direction[1]
+        across = abs(east * direction[0] - north * direction[1])
+        if along <= 0 or across > CORRIDOR_WIDTH:
+            continue
+
+        # Walkers don't follow straight lines; charge the sideways distance too
+        seconds = (along + across) / speed
+        if seconds <= MAX_ARRIVAL_TIME:
+            upcoming.append((seconds, place))
+
+    upcoming.sort(key=lambda item: item[0])
+    return upcoming
+
+
+class Prefetcher:
+    """Background pool that warms place stories at most once at a time per place"""
+
+    def __init__(self, warm, workers):
+        self._warm = warm
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key, *args):
+        """Queue a warm-up unless one for the same key is already running; returns whether it was queued"""
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+
+        future = self._executor.submit(self._warm, *args)
+        future.add_done_callback(lambda _: self._done(key))
+        return True
+
+    def _done(self, key):
+        with self._lock:
+            self._in_flight.discard(key)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
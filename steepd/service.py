@@ -0,0 +1,302 @@
+"""Headless HTTP API for mobile clients, on the same logic as the Streamlit app.
+
+    GET /nearby?lat=51.508&lon=-0.128&radius=1000
+    GET /nearby?lat=51.508&lon=-0.128&mode=adaptive&target=5
+    GET /story/{place}?lat=51.508&lon=-0.128&format=data_saver&narrate=1
+    GET /audio/{key}.mp3
+    GET /stats
+
+Run it with `python -m steepd.service --port 8080`; API keys and base URLs
+come from the same environment variables as steepd.clients.
+
+The blocking place, story and narration calls run on a thread pool.
+Concurrent requests for the same nearby search or the same story share one
+in-flight generation instead of each calling the upstream APIs.
+"""
+import argparse
+import asyncio
+import contextvars
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import quote, urlencode
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from steepd import artifact_cache, narration, narrative, places, stories, telemetry
+from steepd.content_store import place_key
+
+SERVICE_WORKERS = int(os.environ.get("STEEPD_SERVICE_WORKERS", 16))  # blocking calls in flight
+NEARBY_PRECISION = 4  # decimal places of lat/lon shared by coalesced nearby searches (about 10 m)
+MAX_RADIUS = 5000  # metres
+MAX_KNOWN_PLACES = 5000  # places remembered from /nearby, so /story gets their OSM tags
+
+# Narration formats a client can ask for
+AUDIO_FORMATS = {
+    'standard': narration.AUDIO_FORMAT,
+    'data_saver': narration.DATA_SAVER_AUDIO_FORMAT
+}
+
+
+class Coalescer:
+    """Share one in-flight call between concurrent requests with the same key"""
+
+    def __init__(self):
+        self._inflight = {}  # only touched from the event loop, so no lock
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key, work):
+        """Await work() for key, joining a call already in flight for the same key"""
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # A client that disconnects must not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._inflight)}
+
+
+class ServiceError(Exception):
+    """An error reported to the client with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+_executor = ThreadPoolExecutor(max_workers=SERVICE_WORKERS, thread_name_prefix='steepd-service')
+_coalescer = Coalescer()
+_known_places = OrderedDict()  # place_key -> place from a /nearby answer
+_known_lock = threading.Lock()
+
+
+async def _in_thread(function, *args):
+    # Copy the context so spans opened in the thread nest under the request's span
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, context.run, function, *args)
+
+
+def _remember(found):
+    with _known_lock:
+        for place in found:
+            key = place_key(place['name'], (place['lat'], place['lon']))
+            _known_places[key] = place
+            _known_places.move_to_end(key)
+        while len(_known_places) > MAX_KNOWN_PLACES:
+            _known_places.popitem(last=False)
+
+
+def _lookup_place(name, location):
+    """The place as last listed by /nearby, or a bare place for a name and optional location"""
+    if location is None:
+        return {'name': name}
+    with _known_lock:
+        known = _known_places.get(place_key(name, location))
+    return known or {'name': name, 'lat': location[0], 'lon': location[1]}
+
+
+def _float_param(request, name, minimum, maximum, required=True):
+    value = request.query_params.get(name)
+    if value is None:
+        if required:
+            raise ServiceError(400, f"missing query parameter '{name}'")
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ServiceError(400, f"query parameter '{name}' must be a number")
+    if not math.isfinite(number) or not minimum <= number <= maximum:
+        raise ServiceError(400, f"query parameter '{name}' must be between {minimum} and {maximum}")
+    return number
+
+
+def _story_url(request, place):
+    query = urlencode({'lat': place['lat'], 'lon': place['lon']})
+    return f"{request.url_for('story', place=quote(place['name'], safe=''))}?{query}"
+
+
+def _audio_url(request, path):
+    return str(request.url_for('audio', key=artifact_cache.key_of(path))) if path else None
+
+
+def _public_place(place, story_url):
+    return {
+        'name': place['name'],
+        'lat': place['lat'],
+        'lon': place['lon'],
+        'distance': place.get('distance'),
+        'type': place.get('type'),
+        'wiki_title': place.get('wiki_title'),
+        'wiki_url': place.get('wiki_url'),
+        'story_url': story_url
+    }
+
+
+def _find_nearby(lat, lon, radius):
+    try:
+        candidates = places.nearby_candidates(lat, lon, radius)
+    except Exception as e:
+        raise ServiceError(502, f"Error with Overpass API: {e}")
+    return places.verify_places(candidates, lat, lon, radius), None
+
+
+def _search_nearby(lat, lon, rings, target):
+    """Adaptive ring search; returns the places and the search report"""
+    try:
+        return places.adaptive_nearby_places(lat, lon, target=target, rings=rings)
+    except Exception as e:
+        raise ServiceError(502, f"Error with Overpass API: {e}")
+
+
+def _tell_story(place, output_format, narrate):
+    """Fetch the article, write the story and narrate it; returns the story payload"""
+    location = (place['lat'], place['lon']) if 'lat' in place else None
+    story_place = place if location else None
+
+    wiki_info = places.get_wikipedia_info(place['name'], location=location, tags=place.get('tags'))
+    if not wiki_info:
+        raise ServiceError(404, "No Wikipedia information found for this place.")
+
+    try:
+        story = narrative.generate_story(wiki_info, story_place, timeout=stories.STORY_DEADLINE)
+    except Exception as e:
+        raise ServiceError(502, f"Error creating narrative: {e}")
+    if not story:
+        raise ServiceError(502, "The story came back empty.")
+
+    result = {'title': wiki_info['title'], 'url': wiki_info.get('url'), 'text': story, 'audio': None, 'audio_error': None}
+    if narrate:
+        try:
+            result['audio'] = narration.synthesize_audio(
+                story, timeout=stories.NARRATION_DEADLINE, output_format=output_format
+            )
+        except Exception as e:
+            result['audio_error'] = f"Error generating audio: {e}"  # The text is still worth returning
+    return result
+
+
+async def nearby(request):
+    with telemetry.span('service.nearby'):
+        lat = _float_param(request, 'lat', -90, 90)
+        lon = _float_param(request, 'lon', -180, 180)
+        radius = _float_param(request, 'radius', 1, MAX_RADIUS, required=False)
+        mode = request.query_params.get('mode', 'fixed')
+        position = (round(lat, NEARBY_PRECISION), round(lon, NEARBY_PRECISION))
+
+        if mode == 'fixed':
+            radius = int(radius or places.SEARCH_RADIUS)
+            key = ('nearby', *position, radius)
+            work = lambda: _in_thread(_find_nearby, lat, lon, radius)
+        elif mode == 'adaptive':
+            # The rings stop at the requested radius, if one is given
+            radius = int(radius or places.ADAPTIVE_RINGS[-1])
+            rings = tuple(ring for ring in places.ADAPTIVE_RINGS if ring < radius) + (radius,)
+            target = int(_float_param(request, 'target', 1, places.MAX_VERIFIED_PLACES, required=False)
+                         or places.ADAPTIVE_TARGET)
+            key = ('nearby.adaptive', *position, rings, target)
+            work = lambda: _in_thread(_search_nearby, lat, lon, rings, target)
+        else:
+            raise ServiceError(400, "query parameter 'mode' must be 'fixed' or 'adaptive'")
+
+        found, report = await _coalescer.run(key, work)
+        _remember(found)
+
+    result = {'places': [_public_place(place, _story_url(request, place)) for place in found]}
+    if report is not None:
+        result['search'] = report
+    return JSONResponse(result)
+
+
+async def story(request):
+    with telemetry.span('service.story'):
+        name = request.path_params['place']
+        lat = _float_param(request, 'lat', -90, 90, required=False)
+        lon = _float_param(request, 'lon', -180, 180, required=False)
+        location = (lat, lon) if lat is not None and lon is not None else None
+
+        audio_format = request.query_params.get('format', 'standard')
+        if audio_format not in AUDIO_FORMATS:
+            raise ServiceError(400, f"format must be one of: {', '.join(AUDIO_FORMATS)}")
+        narrate = request.query_params.get('narrate', '1') != '0'
+
+        place = _lookup_place(name, location)
+        key = ('story', place_key(name, location), audio_format, narrate)
+        result = await _coalescer.run(key, lambda: _in_thread(_tell_story, place, AUDIO_FORMATS[audio_format], narrate))
+
+    return JSONResponse({
+        'place': name,
+        'title': result['title'],
+        'wiki_url': result['url'],
+        'text': result['text'],
+        'audio_url': _audio_url(request, result['audio']),
+        'audio_error': result['audio_error']
+    })
+
+
+async def audio(request):
+    path = artifact_cache.get_path(request.path_params['key'])
+    if not path:
+        return JSONResponse({'error': "Unknown or expired audio."}, status_code=404)
+    try:
+        data = artifact_cache.read_bytes(path)
+    except OSError:
+        return JSONResponse({'error': "Unknown or expired audio."}, status_code=404)
+    return Response(data, media_type='audio/mpeg', headers={'Cache-Control': 'public, max-age=86400, immutable'})
+
+
+async def stats(request):
+    return JSONResponse({
+        'coalescing': _coalescer.stats(),
+        'latency': telemetry.tracer.latency_summary(),
+        'caches': telemetry.tracer.cache_summary(),
+        'single_flight': telemetry.tracer.flight_summary()
+    })
+
+
+async def service_error(request, exc):
+    return JSONResponse({'error': str(exc)}, status_code=exc.status)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    artifact_cache.start_sweeper()
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route('/nearby', nearby),
+        Route('/story/{place:path}', story, name='story'),
+        Route('/audio/{key}.mp3', audio, name='audio'),
+        Route('/stats', stats)
+    ],
+    exception_handlers={ServiceError: service_error},
+    lifespan=lifespan
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
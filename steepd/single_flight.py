@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import Future
+
+from steepd import telemetry
+
+# Process-wide deduplication of expensive calls. When several sessions, taps
+# or service requests ask for the same story or narration at once, the first
+# caller makes the upstream call and the rest wait for its result (or its
+# error) instead of each calling Wikipedia, OpenAI or ElevenLabs themselves.
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome"""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future
+
+    def begin(self, key):
+        """Claim key; returns (future, leader)
+
+        The leader must call finish() exactly once. Everyone else waits on the
+        future, which gets the leader's result or exception.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        telemetry.tracer.flight(self.name, shared=not leader)
+        return future, leader
+
+    def finish(self, key, result=None, error=None):
+        """Publish the leader's outcome and release key for the next call"""
+        with self._lock:
+            future = self._inflight.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, function, *args, timeout=None, **kwargs):
+        """Return function(*args, **kwargs), sharing a call already in flight for key
+
+        A caller that joins a call in flight waits at most timeout seconds and
+        then raises TimeoutError; the shared call carries on for the others.
+        """
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result(timeout=timeout)
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._inflight)
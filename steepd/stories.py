@@ -0,0 +1,90 @@
+from steepd import city_pack, story_pipeline
+from steepd.narration import AUDIO_FORMAT, PipelinedNarrator, get_cached_audio, synthesize_audio
+from steepd.narrative import generate_story, get_cached_story, stream_story
+from steepd.places import get_wikipedia_info
+
+# Voice streamed stories sentence by sentence while they are being written
+STREAM_STORIES = True
+
+# Each pipeline stage has its own deadline in seconds; a story that misses it
+# is dropped, narration that misses it leaves text only.
+WIKI_DEADLINE = 15
+STORY_DEADLINE = 60
+NARRATION_DEADLINE = 90
+
+
+def story_stages(place, output_format=AUDIO_FORMAT):
+    """Wikipedia, story and narration stages for a selected place
+
+    Places picked from the map carry a location and OSM tags; a searched place
+    is just a name.
+    """
+    location = (place['lat'], place['lon']) if 'lat' in place else None
+    story_place = place if location else None
+
+    narrator = None
+    chunks = []
+
+    def fetch_article(_, context):
+        return get_wikipedia_info(place['name'], location=location, tags=place.get('tags'))
+
+    def write_story(wiki_info, context):
+        nonlocal narrator
+        # A prefetched story and its full narration play at once, with no new TTS requests
+        cached_story = get_cached_story(wiki_info, story_place)
+        if cached_story and get_cached_audio(cached_story, output_format):
+            return cached_story
+
+        # Packed stories come with their narration, so there is nothing to pipeline
+        if not STREAM_STORIES or city_pack.find_story(wiki_info):
+            return generate_story(wiki_info, story_place, timeout=context.remaining())
+
+        narrator = PipelinedNarrator(output_format)
+
+        # Publish the text as it is written and voice it sentence by sentence
+        parts = []
+        story = None
+        try:
+            for text in stream_story(wiki_info, story_place, timeout=context.remaining()):
+                if context.expired():
+                    break
+                parts.append(text)
+                narrator.feed(text)
+                chunks.extend(narrator.ready())
+                context.publish(text="".join(parts), audio=list(chunks))
+            else:
+                story = "".join(parts) or None
+        finally:
+            if story is None:
+                narrator.close()  # An abandoned story stops spending TTS requests
+        return story
+
+    def narrate(story, context):
+        if not narrator:
+            return synthesize_audio(story, timeout=context.remaining(), output_format=output_format)
+
+        chunks.extend(narrator.finish(timeout=context.remaining()))
+        context.publish(audio=list(chunks))
+
+        # Later reruns play the whole story from a single file
+        return narrator.combine(story)
+
+    return [
+        story_pipeline.Stage('wikipedia', fetch_article, WIKI_DEADLINE),
+        story_pipeline.Stage('story', write_story, STORY_DEADLINE),
+        story_pipeline.Stage('narration', narrate, NARRATION_DEADLINE, required=False)
+    ]
+
+
+def warm_place(place, output_format=AUDIO_FORMAT):
+    """Generate and cache the Wikipedia content, story and narration for a place"""
+    try:
+        wiki_info = get_wikipedia_info(place['name'], location=(place['lat'], place['lon']), tags=place.get('tags'))
+        if not wiki_info:
+            return
+
+        story = generate_story(wiki_info, place)
+        if story:
+            synthesize_audio(story, output_format=output_format)
+    except Exception:
+        pass  # Prefetching is opportunistic; a tap will retry and report errors
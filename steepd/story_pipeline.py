@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from steepd import telemetry
+
+# Runs the Wikipedia → story → narration steps for a place off the Streamlit
+# script thread. Stages run one after another on a background event loop, each
+# with its own deadline; the UI polls a job's status instead of blocking on it.
+
+WAITING = "waiting"
+RUNNING = "running"
+DONE = "done"
+TIMED_OUT = "timed out"
+FAILED = "failed"
+SKIPPED = "skipped"
+CANCELLED = "cancelled"
+
+
+class Stage:
+    """One step of a pipeline
+
+    `run(value, context)` is a blocking function that receives the previous
+    stage's result and returns this stage's. A required stage that misses its
+    deadline or fails ends the job; an optional one is recorded and the job
+    finishes with what it has.
+    """
+
+    def __init__(self, name, run, deadline, required=True):
+        self.name = name
+        self.run = run
+        self.deadline = deadline  # seconds
+        self.required = required
+
+
+class StageContext:
+    """What a running stage can see of its job: time left, cancellation and the status channel"""
+
+    def __init__(self, job, deadline):
+        self._job = job
+        self._deadline = time.monotonic() + deadline
+
+    def remaining(self):
+        """Seconds left before the stage's deadline, never below zero"""
+        return max(self._deadline - time.monotonic(), 0.0)
+
+    def expired(self):
+        """True once the stage is past its deadline or the job was cancelled"""
+        return self._job.cancelled() or time.monotonic() >= self._deadline
+
+    def publish(self, **fields):
+        """Share partial results (e.g. streamed text) with the UI"""
+        self._job.update(**fields)
+
+
+class PipelineJob:
+    """Status channel for one pipeline run, safe to read from the script thread while it runs"""
+
+    def __init__(self, stages):
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._future = None
+        self._status = {
+            'stages': {stage.name: WAITING for stage in stages},
+            'results': {},
+            'errors': {},
+            'done': False
+        }
+
+    def update(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    def _set_stage(self, name, state, result=None, error=None):
+        with self._lock:
+            self._status['stages'][name] = state
+            if state == DONE:
+                self._status['results'][name] = result
+            if error:
+                self._status['errors'][name] = error
+
+    def _finish(self):
+        with self._lock:
+            for name, state in self._status['stages'].items():
+                if state == WAITING:
+                    self._status['stages'][name] = SKIPPED
+            self._status['done'] = True
+
+    def snapshot(self):
+        """Copy of the current status: stage states, results, errors, done and any published fields"""
+        with self._lock:
+            status = dict(self._status)
+            for field in ('stages', 'results', 'errors'):
+                status[field] = dict(status[field])
+            return status
+
+    def done(self):
+        with self._lock:
+            return self._status['done']
+
+    def cancel(self):
+        """Stop the job; the running stage is abandoned and later stages are skipped"""
+        self._cancelled.set()
+        if self._future:
+            self._future.cancel()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class StoryPipeline:
+    """Background event loop that runs pipeline jobs, shared by all sessions"""
+
+    def __init__(self, workers):
+        # Stages are blocking API calls, so they run on their own worker threads
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="pipeline-loop", daemon=True).start()
+
+    def start(self, stages, value=None):
+        """Run stages in order starting from value; returns the job to poll"""
+        job = PipelineJob(stages)
+        job._future = asyncio.run_coroutine_threadsafe(self._run(job, stages, value), self._loop)
+        return job
+
+    async def _run(self, job, stages, value):
+        with telemetry.span('pipeline', stages=len(stages)):
+            await self._run_stages(job, stages, value)
+
+    async def _run_stages(self, job, stages, value):
+        try:
+            for stage in stages:
+                if job.cancelled():
+                    break
+
+                job._set_stage(stage.name, RUNNING)
+                context = StageContext(job, stage.deadline)
+                try:
+                    # A stage that misses its deadline is abandoned; its thread
+                    # finishes in the background and only warms the caches
+                    with telemetry.span(f"stage.{stage.name}"):
+                        # Upstream calls made by the stage are traced as its children
+                        run = functools.partial(contextvars.copy_context().run, stage.run, value, context)
+                        value = await asyncio.wait_for(self._loop.run_in_executor(self._executor, run), stage.deadline)
+                except TimeoutError:
+                    job._set_stage(stage.name, TIMED_OUT)
+                    if stage.required:
+                        break
+                    continue
+                except Exception as e:
+                    job._set_stage(stage.name, FAILED, error=str(e))
+                    if stage.required:
+                        break
+                    continue
+
+                job._set_stage(stage.name, DONE, result=value)
+                if value is None and stage.required:
+                    break  # Nothing for the next stage to work with
+        except asyncio.CancelledError:
+            for name, state in job.snapshot()['stages'].items():
+                if state == RUNNING:
+                    job._set_stage(name, CANCELLED)
+        finally:
+            job._finish()
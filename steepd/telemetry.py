@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import secrets
+import threading
+import contextvars
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+
+# Timed spans for upstream calls and pipeline stages, plus cache hit/miss and
+# single-flight counters. Spans are kept in memory for the sidebar's latency summary and
+# appended to a JSONL file, one flat record per span. The records borrow
+# OpenTelemetry's span field names but are not OTLP/JSON: attributes are a
+# plain dict and the status a string. Set STEEPD_TRACE_FILE to an empty
+# string to keep traces in memory only. A full trace file is rolled over to a
+# single backup beside it (traces.jsonl.1), replacing the previous one.
+
+TRACE_FILE = os.environ.get(
+    "STEEPD_TRACE_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "traces.jsonl")
+)
+TRACE_FILE_MAX_BYTES = 10 * 1024 * 1024  # rolled over past this size
+SAMPLES_PER_SPAN = 500  # recent durations kept per span name for percentiles
+
+STATUS_OK = "STATUS_CODE_OK"
+STATUS_ERROR = "STATUS_CODE_ERROR"
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_span_counts = contextvars.ContextVar('span_counts', default=())
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class Tracer:
+    """Records spans, cache lookups and deduplicated calls; safe to use from any thread"""
+
+    def __init__(self, trace_file=TRACE_FILE):
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_SPAN))  # (seconds, failed)
+        self._cache = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        self._flights = defaultdict(lambda: {'calls': 0, 'shared': 0})
+        self._file = None
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as a span
+
+        Spans opened inside it (in the same thread or copied context) become its
+        children. An exception is tagged on the span and re-raised. Yields the
+        attribute dict, so callers can add details found along the way.
+        """
+        parent = _current_span.get()
+        span_id = secrets.token_hex(8)
+        trace_id = parent[0] if parent else secrets.token_hex(16)
+        token = _current_span.set((trace_id, span_id, parent))
+
+        for counts in _span_counts.get():
+            counts[name] += 1
+
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except GeneratorExit:
+            raise  # The generator around the span was closed early; not a failure
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # A generator holding a span was closed from another context
+                _current_span.set(parent)
+
+            if error is not None:
+                attributes['error.type'] = type(error).__name__
+                attributes['error.message'] = str(error)[:200]
+            self._record(name, duration, error is not None, {
+                'traceId': trace_id,
+                'spanId': span_id,
+                'parentSpanId': parent[1] if parent else None,
+                'name': name,
+                'startTimeUnixNano': start_ns,
+                'endTimeUnixNano': start_ns + int(duration * 1e9),
+                'attributes': attributes,
+                'status': {'code': STATUS_ERROR if error is not None else STATUS_OK}
+            })
+
+    @contextmanager
+    def detached(self):
+        """Run the enclosed block under the current span's parent
+
+        A generator yielding from inside a span wraps its yields in this, so
+        spans its consumer opens meanwhile aren't counted as the span's children.
+        """
+        current = _current_span.get()
+        token = _current_span.set(current[2] if current else None)
+        try:
+            yield
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                _current_span.set(current)  # Closed from another context, as in span()
+
+    @contextmanager
+    def count_spans(self):
+        """Count the spans opened inside the enclosed block by name; yields the Counter
+
+        Blocks may nest; a span counts towards every enclosing block.
+        """
+        counts = Counter()
+        token = _span_counts.set(_span_counts.get() + (counts,))
+        try:
+            yield counts
+        finally:
+            _span_counts.reset(token)
+
+    def cache(self, name, hit):
+        """Count one lookup in the named cache"""
+        with self._lock:
+            self._cache[name]['hits' if hit else 'misses'] += 1
+
+    def flight(self, name, shared):
+        """Count one call to a single-flight group; shared calls waited on another caller's result"""
+        with self._lock:
+            self._flights[name]['shared' if shared else 'calls'] += 1
+
+    def _record(self, name, duration, failed, record):
+        with self._lock:
+            self._samples[name].append((duration, failed))
+            self._write(record)
+
+    def _write(self, record):
+        """Append a span to the trace file (caller holds _lock)"""
+        if not self.trace_file:
+            return
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.trace_file) or ".", exist_ok=True)
+                self._file = open(self.trace_file, 'a', buffering=1, encoding='utf-8')
+            self._file.write(json.dumps(record, default=str) + "\n")
+            if self._file.tell() >= TRACE_FILE_MAX_BYTES:
+                self._file.close()
+                self._file = None
+                os.replace(self.trace_file, self.trace_file + ".1")
+        except OSError:
+            self.trace_file = None  # Tracing to disk is best effort; keep the in-memory summary
+
+    def latency_summary(self):
+        """Per span name: count, errors and p50/p95 milliseconds over recent spans"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+
+        summary = {}
+        for name, values in sorted(samples.items()):
+            durations = [duration for duration, _ in values]
+            summary[name] = {
+                'count': len(values),
+                'errors': sum(1 for _, failed in values if failed),
+                'p50_ms': round(_percentile(durations, 0.50) * 1000, 1),
+                'p95_ms': round(_percentile(durations, 0.95) * 1000, 1)
+            }
+        return summary
+
+    def cache_summary(self):
+        """Per cache: hits, misses and hit rate"""
+        with self._lock:
+            return {
+                name: dict(counts, hit_rate=round(counts['hits'] / (counts['hits'] + counts['misses']), 2))
+                for name, counts in sorted(self._cache.items())
+            }
+
+    def flight_summary(self):
+        """Per single-flight group: calls made, calls that shared one in flight, and the deduplicated share"""
+        with self._lock:
+            return {
+                name: dict(counts, dedup_rate=round(counts['shared'] / (counts['calls'] + counts['shared']), 2))
+                for name, counts in sorted(self._flights.items())
+            }
+
+
+tracer = Tracer()
+span = tracer.span
@@ -0,0 +1,314 @@
+import os
+import re
+import threading
+
+from steepd import telemetry
+from steepd.poi_index import distances_m, haversine_m
+
+# Batched Wikipedia article resolution. Candidate titles for many places are
+# looked up together through the MediaWiki query API (with redirects, intro
+# extracts and coordinates), instead of one page request per guess, and then
+# checked with the same location rules as before. Geotagged articles must also
+# lie near the place they were guessed for.
+
+WIKI_API_URL = os.environ.get("STEEPD_WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKIDATA_API_URL = os.environ.get("STEEPD_WIKIDATA_API_URL", "https://www.wikidata.org/w/api.php")
+WIKIDATA_BATCH_SIZE = 50  # wbgetentities limit per request
+BATCH_SIZE = 20  # MediaWiki returns intro extracts for at most 20 pages per request
+GEO_MATCH_DISTANCE = 250  # metres between an OSM place and a geotagged article
+ARTICLE_MAX_DISTANCE = 2000  # metres; a guessed article geotagged further away is about somewhere else
+CONTENT_CHARS = 2000
+
+CHURCH_TERMS = ['church', 'cathedral', 'chapel', 'abbey']
+STATUE_TERMS = ['statue', 'memorial', 'monument', 'sculpture']
+
+# Characters MediaWiki doesn't allow in titles ("|" would also split the batch)
+_INVALID_TITLE = re.compile(r'[#<>\[\]|{}]')
+_WIKIDATA_ID = re.compile(r'^Q\d+$')
+
+
+class FastPathStats:
+    """How many lookups were settled straight from OSM wikipedia/wikidata tags"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.tagged = 0
+        self.hits = 0
+
+    def record(self, lookups, tagged, hits):
+        with self._lock:
+            self.lookups += lookups
+            self.tagged += tagged
+            self.hits += hits
+
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+fast_path_stats = FastPathStats()
+
+
+def area_and_city(address):
+    """Pick the neighbourhood and city names out of a Nominatim address"""
+    area = address.get('suburb') or address.get('neighbourhood') or address.get('district')
+    city = address.get('city') or address.get('town')
+    return area, city
+
+
+def search_titles(place_name, area=None, city=None):
+    """Candidate article titles for a place, most specific first"""
+    name = place_name.lower()
+    search_queries = []
+
+    # For churches, always include location
+    if any(term in name for term in CHURCH_TERMS):
+        if area and city:
+            search_queries = [
+                f"{place_name}, {area}, {city}",
+                f"{place_name}, {area}",
+                f"{place_name}, {city}"
+            ]
+        elif city:
+            search_queries = [f"{place_name}, {city}"]
+        # Don't search without location for churches
+
+    # For statues/memorials, look for the specific installation
+    elif any(term in name for term in STATUE_TERMS):
+        if area:
+            search_queries = [
+                f"{place_name} ({area})",
+                f"{place_name} sculpture {area}",
+                f"{place_name} statue {area}"
+            ]
+        # Don't return generic articles about concepts
+        # The content is verified afterwards
+    else:
+        # For other places, try with location first
+        if area:
+            search_queries.append(f"{place_name}, {area}")
+        if city and city != area:
+            search_queries.append(f"{place_name}, {city}")
+        search_queries.append(place_name)
+
+    return search_queries
+
+
+def verify_article(place_name, content, area=None, city=None):
+    """Check that an article's opening text is about the right place"""
+    name = place_name.lower()
+    content = content[:1000].lower()
+
+    # For churches - must mention the location
+    if any(term in name for term in ['church', 'cathedral', 'chapel']):
+        return bool((area and area.lower() in content) or (city and city.lower() in content))
+
+    # For statues/sculptures - must be about an artwork, not a company or concept
+    if any(term in name for term in ['statue', 'memorial', 'sculpture']):
+        # Skip if it's about a company, brand, or activity
+        skip_terms = ['company', 'corporation', 'brand', 'whisky', 'whiskey', 'activity', 'exercise',
+                      'walking the dog']
+        if any(term in content for term in skip_terms):
+            return False
+
+        # Must mention sculpture/statue/artwork
+        artwork_terms = ['sculpture', 'statue', 'artwork', 'memorial', 'monument', 'artist', 'sculptor',
+                         'bronze', 'stone', 'marble']
+        if not any(term in content for term in artwork_terms):
+            return False
+
+        # And should mention the location if it's a real statue
+        return bool((area and area.lower() in content) or (city and city.lower() in content))
+
+    # For other places, be more lenient
+    return True
+
+
+def fetch_pages(client, titles):
+    """Look up many titles at once; returns {requested title: page dict or None}"""
+    titles = [title for title in dict.fromkeys(titles) if title and not _INVALID_TITLE.search(title)]
+    found = {}
+
+    for start in range(0, len(titles), BATCH_SIZE):
+        batch = titles[start:start + BATCH_SIZE]
+        with telemetry.span('wikipedia.query', titles=len(batch)):
+            response = client.get(WIKI_API_URL, params={
+                'action': 'query',
+                'format': 'json',
+                'formatversion': 2,
+                'redirects': 1,
+                'prop': 'extracts|info|coordinates',
+                'exintro': 1,
+                'explaintext': 1,
+                'exlimit': 'max',
+                'inprop': 'url',
+                'titles': '|'.join(batch)
+            })
+            response.raise_for_status()
+            query = response.json().get('query', {})
+
+        # Follow title normalization and redirects back to the requested titles
+        normalized = {item['from']: item['to'] for item in query.get('normalized', [])}
+        redirects = {item['from']: item['to'] for item in query.get('redirects', [])}
+        pages = {
+            page['title']: page for page in query.get('pages', [])
+            if not page.get('missing') and not page.get('invalid')
+        }
+
+        for title in batch:
+            resolved = normalized.get(title, title)
+            resolved = redirects.get(resolved, resolved)
+            found[title] = pages.get(resolved)
+
+    return found
+
+
+def geosearch(client, lat, lon, radius, limit=100):
+    """Geotagged articles around a point, as dicts with title, lat and lon"""
+    with telemetry.span('wikipedia.geosearch', radius=radius):
+        response = client.get(WIKI_API_URL, params={
+            'action': 'query',
+            'format': 'json',
+            'formatversion': 2,
+            'list': 'geosearch',
+            'gscoord': f"{lat}|{lon}",
+            'gsradius': min(int(radius), 10000),  # API maximum
+            'gslimit': limit
+        })
+        response.raise_for_status()
+        return response.json().get('query', {}).get('geosearch', [])
+
+
+def _comparable(name):
+    """Lower-cased name without a trailing disambiguator or punctuation"""
+    name = re.sub(r'\s*\([^)]*\)$', '', name.lower())
+    return re.sub(r'[^\w\s]', '', name).strip()
+
+
+def geotagged_title(place_name, lat, lon, geo_pages):
+    """Title of a nearby geotagged article named like the place, if any"""
+    wanted = _comparable(place_name)
+    matches = [page for page in geo_pages if _comparable(page['title']) == wanted]
+    if not matches:
+        return None
+
+    distances = distances_m(lat, lon, [page['lat'] for page in matches], [page['lon'] for page in matches])
+    best = int(distances.argmin())
+    return matches[best]['title'] if distances[best] <= GEO_MATCH_DISTANCE else None
+
+
+def near_location(page, location, max_distance=ARTICLE_MAX_DISTANCE):
+    """Whether a page is geotagged near location; pages without coordinates aren't ruled out"""
+    coordinates = page.get('coordinates')
+    if not location or not coordinates:
+        return True
+    return haversine_m(location[0], location[1], coordinates[0]['lat'], coordinates[0]['lon']) <= max_distance
+
+
+def to_payload(page):
+    """The article fields kept for storytelling"""
+    return {
+        'title': page['title'],
+        'content': page.get('extract', '')[:CONTENT_CHARS],
+        'url': page.get('fullurl'),
+        'revision': page.get('lastrevid')
+    }
+
+
+def tagged_title(tags):
+    """English article title from an OSM wikipedia=en:... tag, if there is one"""
+    language, separator, title = tags.get('wikipedia', '').partition(':')
+    title = title.split('#')[0].strip()
+    if separator and language.strip() == 'en' and title:
+        return title
+    return None
+
+
+def tagged_wikidata_id(tags):
+    """Wikidata item id from an OSM wikidata=Q... tag, if there is one"""
+    value = tags.get('wikidata', '').split(';')[0].strip()
+    return value if _WIKIDATA_ID.match(value) else None
+
+
+def wikidata_titles(client, ids):
+    """Map Wikidata ids to their English Wikipedia titles"""
+    ids = list(dict.fromkeys(ids))
+    titles = {}
+
+    for start in range(0, len(ids), WIKIDATA_BATCH_SIZE):
+        batch = ids[start:start + WIKIDATA_BATCH_SIZE]
+        with telemetry.span('wikidata.sitelinks', ids=len(batch)):
+            response = client.get(WIKIDATA_API_URL, params={
+                'action': 'wbgetentities',
+                'format': 'json',
+                'ids': '|'.join(batch),
+                'props': 'sitelinks',
+                'sitefilter': 'enwiki'
+            })
+            response.raise_for_status()
+            entities = response.json().get('entities', {})
+
+        for entity_id, entity in entities.items():
+            sitelink = entity.get('sitelinks', {}).get('enwiki')
+            if sitelink:
+                titles[entity_id] = sitelink['title']
+
+    return titles
+
+
+def resolve_tagged(client, tags_list):
+    """Resolve places straight from their OSM wikipedia/wikidata tags
+
+    Tags point at a specific article, so there is no title guessing and no
+    location check. Returns a payload or None per entry (None when a place has
+    no usable tag or the article can't be found).
+    """
+    titles = [tagged_title(tags or {}) for tags in tags_list]
+
+    # Places tagged only with a Wikidata item get their title through its enwiki sitelink
+    wikidata_ids = {
+        i: tagged_wikidata_id(tags or {}) for i, tags in enumerate(tags_list) if not titles[i]
+    }
+    if any(wikidata_ids.values()):
+        linked = wikidata_titles(client, [item for item in wikidata_ids.values() if item])
+        for i, item in wikidata_ids.items():
+            titles[i] = linked.get(item) if item else None
+
+    pages = fetch_pages(client, [title for title in titles if title])
+    results = [to_payload(pages[title]) if title and pages.get(title) else None for title in titles]
+
+    fast_path_stats.record(
+        lookups=len(tags_list),
+        tagged=sum(1 for tags in tags_list if tags and (tagged_title(tags) or tagged_wikidata_id(tags))),
+        hits=sum(1 for result in results if result)
+    )
+    return results
+
+
+def resolve_articles(client, lookups):
+    """Find verified articles for many places with a few batched requests
+
+    Each lookup is a dict with 'name', 'area', 'city' and optionally
+    'location' (the place's lat, lon) and 'preferred' (a title to try first,
+    e.g. from geosearch). Returns a payload or None per lookup, in order.
+    """
+    candidates = []
+    for lookup in lookups:
+        titles = search_titles(lookup['name'], lookup.get('area'), lookup.get('city'))
+        if lookup.get('preferred'):
+            titles = [lookup['preferred']] + [title for title in titles if title != lookup['preferred']]
+        candidates.append(titles)
+
+    pages = fetch_pages(client, [title for titles in candidates for title in titles])
+
+    results = []
+    for lookup, titles in zip(lookups, candidates):
+        result = None
+        for title in titles:
+            page = pages.get(title)
+            if page and near_location(page, lookup.get('location')) and verify_article(
+                    lookup['name'], page.get('extract', ''), lookup.get('area'), lookup.get('city')):
+                result = to_payload(page)
+                break
+        results.append(result)
+    return results
@@ -0,0 +1,16 @@
+from steepd import places
+
+
+def test_adaptive_search_without_budget_searches_no_rings():
+    found, report = places.adaptive_nearby_places(51.508, -0.128, budget=0)
+    assert found == []
+    assert report['rings'] == 0
+    assert report['radius'] is None
+    assert report['upstream_calls'] == 0
+
+
+def test_adaptive_search_without_rings_searches_no_rings():
+    found, report = places.adaptive_nearby_places(51.508, -0.128, rings=())
+    assert found == []
+    assert report['rings'] == 0
+    assert report['checked'] == 0
@@ -0,0 +1,68 @@
+"""Benchmark: import and cold-start time of the steepd package and the Streamlit app.
+
+Each target is imported in a fresh interpreter, several times, and the median
+wall time is reported. `main` is imported headless with placeholder secrets,
+which is roughly what `streamlit run main.py` pays before the first page shows.
+
+    python -m tools.bench_import --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    'steepd': "import steepd",
+    'steepd.places': "import steepd.places",
+    'steepd.stories': "import steepd.stories",
+    'first story client': (
+        "import steepd.clients as c; c.configure(openai_api_key='unused', elevenlabs_api_key='unused'); "
+        "c.openai_client(); c.elevenlabs_client()"
+    ),
+    'main': (
+        "import streamlit.config, streamlit.logger; streamlit.config.get_config_options(); "
+        "streamlit.logger.set_log_level('error'); import main"
+    )
+}
+
+TIMER = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def time_import(statement, workdir):
+    """Seconds taken by statement in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, '-c', TIMER.format(root=ROOT, statement=statement)],
+        cwd=workdir, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help="fresh interpreters per target")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Streamlit reads secrets from .streamlit/secrets.toml in the working directory
+        os.makedirs(os.path.join(workdir, '.streamlit'))
+        with open(os.path.join(workdir, '.streamlit', 'secrets.toml'), 'w') as f:
+            f.write('OPENAI_API_KEY = "unused"\nELEVENLABS_API_KEY = "unused"\n')
+
+        print(f"  {'target':<20} {'median ms':>10} {'min ms':>10}")
+        for name, statement in TARGETS.items():
+            times = [time_import(statement, workdir) for _ in range(args.repeat)]
+            print(f"  {name:<20} {statistics.median(times) * 1000:>10.0f} {min(times) * 1000:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
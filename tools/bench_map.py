@@ -0,0 +1,118 @@
+"""Benchmark: map rendering per Streamlit rerun, rebuilt from scratch versus steepd.map_view.
+
+Simulates a walk of GPS fixes a few metres apart, with sidebar clicks in
+between that rerun the script without moving. For each rerun the map is
+turned into the arguments st_folium sends to the browser, and the benchmark
+counts:
+
+  bytes       size of the script, HTML and marker layer shipped per rerun
+  remounts    reruns whose base map script changed, so the browser rebuilds the map and tiles
+  redraws     reruns whose marker layer changed, so the browser replaces the markers
+  ms          Python time spent building and rendering the map
+
+    python -m tools.bench_map --places 8 --places 120 --steps 40
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import folium
+from streamlit_folium import _get_feature_group_string, _get_header, _get_html, _get_map_string
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steepd import map_view  # noqa: E402
+
+START = (51.5080, -0.1281)
+STEP_M = 4  # metres walked between GPS fixes
+CLICKS_PER_STEP = 2  # sidebar reruns between fixes
+RERANK_M = 25  # the app keeps its place list until the walker has moved this far
+
+
+def synthetic_places(lat, lon, count):
+    """count places on a ring around (lat, lon), with distances from it"""
+    places = []
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        distance = 80 + (i * 37) % 900
+        places.append({
+            'name': f"Place {i}",
+            'lat': round(lat + distance * math.cos(angle) / 111_320, 6),
+            'lon': round(lon + distance * math.sin(angle) / (111_320 * math.cos(math.radians(lat))), 6),
+            'distance': distance
+        })
+    return places
+
+
+def rebuilt_map(lat, lon, places):
+    """The map as create_map used to build it: a fresh map with every marker, on each rerun"""
+    m = folium.Map(location=[lat, lon], zoom_start=15)
+    folium.Marker([lat, lon], popup="You are here", tooltip="Current Location",
+                  icon=folium.Icon(color='red', icon='user')).add_to(m)
+    for place in places:
+        folium.Marker([place['lat'], place['lon']], popup=place['name'],
+                      tooltip=f"{place['name']} ({place['distance']}m away)",
+                      icon=folium.Icon(color='blue', icon='info-sign')).add_to(m)
+    return m, None
+
+
+def layered_map(lat, lon, places):
+    """The map as main.show_map builds it: a base map per bucket and a separate marker layer"""
+    return map_view.base_map(map_view.center_bucket(lat, lon)), map_view.marker_layer(lat, lon, places)
+
+
+def component_args(m, layer):
+    """What st_folium ships to the browser: base map script, HTML, header and marker layer"""
+    m.get_root().render()
+    m.render()
+    html, header, script = _get_html(m), _get_header(m), _get_map_string(m)
+    layer_script = _get_feature_group_string(layer, map=m, idx=0) if layer is not None else ""
+    return script, html + header, layer_script
+
+
+def walk(build, place_count, steps):
+    lat, lon = START
+    ranked_at, places = None, []
+    previous = None
+    totals = {'reruns': 0, 'bytes': 0, 'remounts': 0, 'redraws': 0, 'ms': 0.0}
+
+    for step in range(steps):
+        lat += STEP_M / 111_320
+        moved = ranked_at is None or (lat - ranked_at[0]) * 111_320 >= RERANK_M
+        if moved:
+            ranked_at, places = (lat, lon), synthetic_places(lat, lon, place_count)
+
+        for _ in range(1 + CLICKS_PER_STEP):
+            start = time.perf_counter()
+            script, page, layer_script = component_args(*build(lat, lon, places))
+            totals['ms'] += (time.perf_counter() - start) * 1000
+            totals['reruns'] += 1
+            totals['bytes'] += len(script) + len(page) + len(layer_script)
+            if previous is None or script != previous[0]:
+                totals['remounts'] += 1
+            if previous is None or layer_script != previous[1]:
+                totals['redraws'] += 1
+            previous = (script, layer_script)
+
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--places', type=int, action='append', help="places shown (repeatable)")
+    parser.add_argument('--steps', type=int, default=40, help="GPS fixes along the walk")
+    args = parser.parse_args()
+
+    print(f"  {'places':>6} {'map':<10} {'reruns':>7} {'KiB/rerun':>10} {'remounts':>9} {'redraws':>8} {'ms/rerun':>9}")
+    for count in args.places or [8, 120]:
+        for name, build in (('rebuilt', rebuilt_map), ('layered', layered_map)):
+            totals = walk(build, count, args.steps)
+            reruns = totals['reruns']
+            print(f"  {count:>6} {name:<10} {reruns:>7} {totals['bytes'] / reruns / 1024:>10.1f} "
+                  f"{totals['remounts']:>9} {totals['redraws']:>8} {totals['ms'] / reruns:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Benchmark: nearby-place search and the story pipeline, end to end and offline.
+
+Starts the stand-in upstreams from tools/stub_upstreams.py, points the app at
+them, imports main.py headless and drives the real functions over a fixed
+corpus of coordinates: dense central London, suburbs and sparse outskirts.
+The first pass starts with empty caches; later passes reuse them in-process.
+
+Reports latency distributions per phase and area, requests received by each
+upstream, the app's own span timings and cache hit rates, and peak memory.
+
+    python -m tools.bench_pipeline --runs 2 --latency overpass=1.5 --json results.json
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from tools.stub_upstreams import StubUpstreams, parse_latency
+
+CORPUS = {
+    'dense': [
+        ('Trafalgar Square', 51.5080, -0.1281),
+        ("St Paul's", 51.5138, -0.0984),
+        ('Westminster', 51.5007, -0.1246),
+        ('Covent Garden', 51.5117, -0.1240)
+    ],
+    'suburb': [
+        ('Ealing', 51.5130, -0.3089),
+        ('Walthamstow', 51.5830, -0.0200),
+        ('Bromley', 51.4059, 0.0139)
+    ],
+    'sparse': [
+        ('Epping Forest', 51.6560, 0.0500),
+        ('Richmond Park', 51.4420, -0.2750),
+        ('Dartford Marshes', 51.4700, 0.2300)
+    ]
+}
+
+STORY_POLL_INTERVAL = 0.01  # seconds
+STORY_TIMEOUT = 300
+
+
+def _percentiles(values):
+    ordered = sorted(values)
+    pick = lambda fraction: ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+    return {
+        'n': len(ordered),
+        'p50_ms': round(pick(0.50) * 1000, 1),
+        'p95_ms': round(pick(0.95) * 1000, 1),
+        'max_ms': round(ordered[-1] * 1000, 1)
+    }
+
+
+def load_app(stubs, workdir, nominatim_interval):
+    """Import main.py headless against the stubs, with caches in workdir"""
+    os.environ.update(stubs.env())
+    os.environ.update({
+        'STEEPD_GEOCODE_DB': os.path.join(workdir, 'geocode.sqlite3'),
+        'STEEPD_ARTIFACT_DIR': os.path.join(workdir, 'artifacts'),
+        'STEEPD_TRACE_FILE': os.path.join(workdir, 'traces.jsonl'),
+        'STEEPD_POI_INDEX': os.path.join(workdir, 'no_poi_index.sqlite3')
+    })
+
+    # Streamlit reads secrets from .streamlit/secrets.toml in the working directory
+    os.makedirs(os.path.join(workdir, '.streamlit'), exist_ok=True)
+    with open(os.path.join(workdir, '.streamlit', 'secrets.toml'), 'w') as f:
+        for key, value in stubs.secrets().items():
+            f.write(f'{key} = "{value}"\n')
+    os.chdir(workdir)
+
+    # Running outside `streamlit run` makes Streamlit warn on every UI call; parse
+    # its config first, or that resets the log level
+    importlib.import_module('streamlit.config').get_config_options()
+    importlib.import_module('streamlit.logger').set_log_level('error')
+    main = importlib.import_module('main')
+    if nominatim_interval is not None:
+        importlib.import_module('steepd.geocoding').NOMINATIM_MIN_INTERVAL = nominatim_interval
+    return main
+
+
+def time_story(main, place):
+    """Run the story pipeline for a place; returns (total, first text, first audio) seconds"""
+    start = time.perf_counter()
+    stages = importlib.import_module('steepd.stories').story_stages(place)
+    job = main.get_story_pipeline().start(stages)
+    first_text = first_audio = None
+
+    while time.perf_counter() - start < STORY_TIMEOUT:
+        status = job.snapshot()
+        elapsed = time.perf_counter() - start
+        if first_text is None and (status.get('text') or status['results'].get('story')):
+            first_text = elapsed
+        if first_audio is None and (status.get('audio') or status['results'].get('narration')):
+            first_audio = elapsed
+        if status['done']:
+            return elapsed, first_text, first_audio, status['stages']
+        time.sleep(STORY_POLL_INTERVAL)
+
+    job.cancel()
+    raise TimeoutError(f"story for {place['name']} did not finish in {STORY_TIMEOUT}s")
+
+
+def run(main, stubs, runs, stories_per_point):
+    timings = defaultdict(list)  # (phase, pass, area) -> seconds
+    requests = []
+    outcomes = defaultdict(int)
+
+    for run_index in range(runs):
+        label = 'cold' if run_index == 0 else 'warm'
+        before = stubs.counts.snapshot()
+
+        for area, points in CORPUS.items():
+            for name, lat, lon in points:
+                start = time.perf_counter()
+                places = main.get_nearby_places(lat, lon)
+                timings[('nearby', label, area)].append(time.perf_counter() - start)
+                print(f"  [{label}] {area:<7} {name:<18} {len(places)} places "
+                      f"in {(time.perf_counter() - start) * 1000:.0f} ms", file=sys.stderr)
+
+                for place in places[:stories_per_point]:
+                    total, first_text, first_audio, stages = time_story(main, place)
+                    timings[('story', label, area)].append(total)
+                    if first_text is not None:
+                        timings[('first_text', label, area)].append(first_text)
+                    if first_audio is not None:
+                        timings[('first_audio', label, area)].append(first_audio)
+                    for stage, state in stages.items():
+                        outcomes[f"{stage} {state}"] += 1
+
+        after = stubs.counts.snapshot()
+        requests.append({'pass': label, **{upstream: after[upstream] - before[upstream] for upstream in after}})
+
+    return timings, requests, dict(outcomes)
+
+
+def report(timings, requests, outcomes, telemetry, peak_traced, max_rss_kb):
+    latency = {f"{phase} {label} {area}": _percentiles(values) for (phase, label, area), values in timings.items()}
+
+    print("\nLatency by phase, pass and area")
+    print(f"  {'phase':<30} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for key, stats in latency.items():
+        print(f"  {key:<30} {stats['n']:>4} {stats['p50_ms']:>10} {stats['p95_ms']:>10} {stats['max_ms']:>10}")
+
+    print("\nRequests received by each upstream")
+    for row in requests:
+        print("  " + "  ".join(f"{key}={value}" for key, value in row.items()))
+
+    spans = telemetry.tracer.latency_summary()
+    print("\nApp spans")
+    for name, stats in spans.items():
+        print(f"  {name:<22} n={stats['count']:<5} errors={stats['errors']:<3} "
+              f"p50={stats['p50_ms']} ms  p95={stats['p95_ms']} ms")
+
+    caches = telemetry.tracer.cache_summary()
+    print("\nCaches")
+    for name, stats in caches.items():
+        print(f"  {name:<10} hits={stats['hits']:<5} misses={stats['misses']:<5} hit rate={stats['hit_rate']}")
+
+    print(f"\nStory stage outcomes: {outcomes}")
+    print(f"Memory: peak traced {peak_traced / 2**20:.1f} MiB, max RSS {max_rss_kb / 1024:.1f} MiB")
+
+    return {
+        'latency': latency,
+        'requests': requests,
+        'spans': spans,
+        'caches': caches,
+        'story_outcomes': outcomes,
+        'memory': {'peak_traced_bytes': peak_traced, 'max_rss_kb': max_rss_kb}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=2, help="passes over the corpus; the first is cold")
+    parser.add_argument('--stories', type=int, default=1, help="stories told per coordinate")
+    parser.add_argument('--latency', action='append', metavar='UPSTREAM=SECONDS',
+                        help="injected latency per upstream (repeatable)")
+    parser.add_argument('--nominatim-interval', type=float, default=None,
+                        help="override the Nominatim rate limit (seconds between requests)")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None  # the app runs from a temporary directory
+
+    # main.py lives in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    with StubUpstreams(parse_latency(args.latency)) as stubs, tempfile.TemporaryDirectory() as workdir:
+        tracemalloc.start()
+        app = load_app(stubs, workdir, args.nominatim_interval)
+        timings, requests, outcomes = run(app, stubs, args.runs, args.stories)
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results = report(timings, requests, outcomes, importlib.import_module('steepd.telemetry'), peak_traced,
+                         resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        results['latency_injected'] = stubs.latency
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
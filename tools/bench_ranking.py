@@ -0,0 +1,98 @@
+"""Micro-benchmark: candidate ranking in get_nearby_places.
+
+Compares the original per-element loop (geopy geodesic, substring scan over
+the exclusion list, full sort) with poi_index.rank_places on synthetic
+Overpass responses of increasing size.
+
+    python -m tools.bench_ranking
+"""
+import argparse
+import random
+import timeit
+
+from geopy.distance import geodesic
+
+from steepd import poi_index
+
+CENTER = (51.5074, -0.1278)
+NAMES = ['Church', 'Memorial', 'Gardens', 'Theatre', 'Library', 'Statue', 'Museum', 'Tesco Express', 'Costa']
+
+
+def synthetic_elements(count, radius=1000, seed=0):
+    """Random elements scattered within radius metres of CENTER"""
+    rng = random.Random(seed)
+    elements = []
+    for i in range(count):
+        dlat = rng.uniform(-1, 1) * radius / 111320
+        dlon = rng.uniform(-1, 1) * radius / 69500
+        name = f"{rng.choice(NAMES)} {i // 3}"  # Some duplicate names
+        point = {'lat': CENTER[0] + dlat, 'lon': CENTER[1] + dlon}
+        element = {'type': 'node', 'id': i, 'tags': {'name': name, 'historic': 'yes'}}
+        if i % 4:
+            element.update(point)
+        else:
+            element['type'] = 'way'
+            element['center'] = point
+        elements.append(element)
+    return elements
+
+
+def legacy_rank(elements, lat, lon, limit):
+    """The ranking loop as it was before rank_places"""
+    potential_places = []
+    seen_names = set()
+    for element in elements:
+        tags = element.get('tags', {})
+        name = tags.get('name')
+        if not name or name in seen_names:
+            continue
+        if any(exclude in name.lower() for exclude in poi_index.EXCLUDE_TERMS):
+            continue
+        seen_names.add(name)
+        if 'lat' in element and 'lon' in element:
+            elem_lat, elem_lon = element['lat'], element['lon']
+        elif 'center' in element:
+            elem_lat, elem_lon = element['center']['lat'], element['center']['lon']
+        else:
+            continue
+        distance = geodesic((lat, lon), (elem_lat, elem_lon)).meters
+        place_info = {'name': name, 'lat': elem_lat, 'lon': elem_lon, 'distance': int(distance), 'tags': tags}
+        place_type = poi_index.place_type(tags)
+        if place_type:
+            place_info['type'] = place_type
+        potential_places.append(place_info)
+    potential_places.sort(key=lambda x: x['distance'])
+    return potential_places[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,500,2000,10000', help="comma-separated element counts")
+    parser.add_argument('--limit', type=int, default=20, help="candidates kept, as MAX_CANDIDATES")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'elements':>8}  {'legacy ms':>10}  {'ranked ms':>10}  {'speedup':>7}  {'max dist diff m':>15}  {'same order':>10}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        elements = synthetic_elements(size)
+        legacy = legacy_rank(elements, *CENTER, args.limit)
+        ranked = poi_index.rank_places(elements, *CENTER, limit=args.limit)
+
+        # Same places should come back; distances may differ by rounding
+        legacy_distance = {place['name']: place['distance'] for place in legacy}
+        max_diff = max(abs(place['distance'] - legacy_distance.get(place['name'], place['distance']))
+                       for place in ranked)
+        same_order = [place['name'] for place in legacy] == [place['name'] for place in ranked]
+
+        number = max(1, 2000 // size)
+        legacy_s = min(timeit.repeat(lambda: legacy_rank(elements, *CENTER, args.limit),
+                                     number=number, repeat=args.repeat)) / number
+        ranked_s = min(timeit.repeat(lambda: poi_index.rank_places(elements, *CENTER, limit=args.limit),
+                                     number=number, repeat=args.repeat)) / number
+
+        print(f"{size:>8}  {legacy_s * 1000:>10.2f}  {ranked_s * 1000:>10.2f}  "
+              f"{legacy_s / ranked_s:>6.1f}x  {max_diff:>15}  {str(same_order):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark: fixed-radius nearby search versus adaptive ring search, offline.
+
+Starts the stand-in upstreams from tools/stub_upstreams.py and runs every
+point of the bench_pipeline corpus through each search mode, each mode in a
+fresh interpreter with empty caches. Upstream requests are counted per query
+from the app's own spans, so the table shows the requests each mode made, the
+requests the adaptive search saved and the places each found.
+
+    python -m tools.bench_search --target 5 --latency overpass=0
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from tools.bench_pipeline import CORPUS
+from tools.stub_upstreams import StubUpstreams, parse_latency
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('fixed', 'adaptive')
+
+
+def run_queries(mode, target):
+    """Run the corpus through one search mode in this process; prints a JSON line per query"""
+    sys.path.insert(0, ROOT)
+    from steepd import geocoding, places, telemetry
+    geocoding.NOMINATIM_MIN_INTERVAL = 0  # the stub has no rate limit
+
+    for area, points in CORPUS.items():
+        for name, lat, lon in points:
+            start = time.perf_counter()
+            if mode == 'fixed':
+                with telemetry.tracer.count_spans() as calls:
+                    found = places.get_nearby_places(lat, lon)
+                report = {'radius': places.SEARCH_RADIUS, 'upstream_calls': sum(calls[s] for s in places.UPSTREAM_SPANS)}
+            else:
+                found, report = places.adaptive_nearby_places(lat, lon, target=target)
+            print(json.dumps({
+                'area': area,
+                'point': name,
+                'places': len(found),
+                'ms': round((time.perf_counter() - start) * 1000, 1),
+                **report
+            }), flush=True)
+
+
+def run_mode(mode, target, stubs):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ, **stubs.env(),
+            STEEPD_GEOCODE_DB=os.path.join(workdir, 'geocode.sqlite3'),
+            STEEPD_ARTIFACT_DIR=os.path.join(workdir, 'artifacts'),
+            STEEPD_TRACE_FILE='',
+            STEEPD_POI_INDEX=os.path.join(workdir, 'no_poi_index.sqlite3')
+        )
+        output = subprocess.run(
+            [sys.executable, '-m', 'tools.bench_search', '--child', mode, '--target', str(target)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', type=int, default=5, help="verified places the adaptive search stops at")
+    parser.add_argument('--latency', action='append', metavar='UPSTREAM=SECONDS',
+                        help="injected latency per upstream (repeatable)")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_queries(args.child, args.target)
+        return
+
+    with StubUpstreams(parse_latency(args.latency)) as stubs:
+        results = {mode: run_mode(mode, args.target, stubs) for mode in MODES}
+
+    print(f"  {'area':<7} {'point':<18} {'fixed':>6} {'adaptive':>9} {'saved':>6} "
+          f"{'places':>8} {'radius':>7} {'checked':>8} {'fixed ms':>9} {'adapt ms':>9}")
+    totals = {'fixed': 0, 'adaptive': 0}
+    for fixed, adaptive in zip(results['fixed'], results['adaptive']):
+        totals['fixed'] += fixed['upstream_calls']
+        totals['adaptive'] += adaptive['upstream_calls']
+        print(f"  {fixed['area']:<7} {fixed['point']:<18} {fixed['upstream_calls']:>6} "
+              f"{adaptive['upstream_calls']:>9} {fixed['upstream_calls'] - adaptive['upstream_calls']:>6} "
+              f"{fixed['places']:>3} / {adaptive['places']:<2} {adaptive['radius']:>7} {adaptive['checked']:>8} "
+              f"{fixed['ms']:>9} {adaptive['ms']:>9}")
+    print(f"\nUpstream requests: fixed {totals['fixed']}, adaptive {totals['adaptive']}, "
+          f"saved {totals['fixed'] - totals['adaptive']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(results, target=args.target, latency_injected=stubs.latency), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""Build an offline city pack: places, articles, stories and narration for a bounding box.
+
+Runs the app's own pipeline over every notable place in the box: the Overpass
+query (or the local POI index where it covers the box), Wikipedia
+verification, story writing and narration. Places are processed in parallel
+and each upstream has its own request rate; Nominatim lookups keep to its
+usage policy of one per second, which usually bounds a first build.
+
+Progress is checkpointed to <output>.partial after every step, so running the
+same command again after an interruption or failures carries on where it
+stopped. The box is widened to whole grid tiles, so the app's tile fetches
+inside it never go upstream. The pack keeps only places with a story and is
+moved into place once complete.
+
+    python -m tools.build_city_pack 51.500,-0.135,51.515,-0.115 --output data/city_pack.sqlite3
+    python -m tools.build_city_pack 51.500,-0.135,51.515,-0.115 --no-audio --story-rate 0.5
+
+API keys and base URLs come from the same environment variables as
+steepd.clients. Point the app or the service at the pack with STEEPD_CITY_PACK.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from steepd import city_pack, narration, narrative, places, poi_index
+from steepd.content_store import place_key, wiki_misses
+from tools.build_poi_index import parse_bbox
+
+AREA_TILES = 3  # grid tiles per side fetched with one Overpass request
+AUDIO_FORMATS = {'standard': narration.AUDIO_FORMAT, 'data_saver': narration.DATA_SAVER_AUDIO_FORMAT}
+
+
+class RateLimiter:
+    """Space requests at least 1/rate seconds apart across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+class Checkpoint:
+    """Build progress in SQLite: fetched areas, then each place's article, story and audio"""
+
+    def __init__(self, path, bbox):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS areas (row INTEGER, col INTEGER, PRIMARY KEY (row, col));
+            CREATE TABLE IF NOT EXISTS places (
+                osm_type TEXT NOT NULL,
+                osm_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                tags TEXT NOT NULL,
+                checked INTEGER NOT NULL DEFAULT 0,
+                article TEXT,
+                story TEXT,
+                audio BLOB,
+                error TEXT,
+                PRIMARY KEY (osm_type, osm_id)
+            );
+        """)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('bbox', ?)", (json.dumps(list(bbox)),))
+        self._db.commit()
+        if json.loads(self._query("SELECT value FROM meta WHERE key = 'bbox'")[0][0]) != list(bbox):
+            sys.exit(f"{path} belongs to a build of another bounding box; delete it to start over")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _update(self, sql, params=()):
+        with self._lock:
+            self._db.execute(sql, params)
+            self._db.commit()
+
+    def has_area(self, area):
+        return bool(self._query("SELECT 1 FROM areas WHERE row = ? AND col = ?", area))
+
+    def area_count(self):
+        return self._query("SELECT COUNT(*) FROM areas")[0][0]
+
+    def add_area(self, area, elements, bounds):
+        """Record the places of one fetched area that lie inside the pack's bounds"""
+        south, west, north, east = bounds
+        with self._lock:
+            for element in elements:
+                tags = element.get('tags', {})
+                point = element if 'lat' in element else element.get('center')
+                if not point or not (south <= point['lat'] <= north and west <= point['lon'] <= east):
+                    continue
+                if not poi_index.matches_filters(element.get('type', 'node'), tags) or poi_index.is_excluded(tags['name']):
+                    continue
+                self._db.execute(
+                    "INSERT OR IGNORE INTO places (osm_type, osm_id, name, lat, lon, tags) VALUES (?, ?, ?, ?, ?, ?)",
+                    (element.get('type', 'node'), element.get('id', 0), tags['name'], point['lat'], point['lon'],
+                     json.dumps(tags))
+                )
+            self._db.execute("INSERT INTO areas VALUES (?, ?)", area)
+            self._db.commit()
+
+    def _places(self, where, audio=False):
+        """Yield matching places, grouped by grid tile; MP3s are only loaded if `audio`"""
+        rows = self._db.execute(
+            "SELECT osm_type, osm_id, name, lat, lon, tags, article, story, audio IS NOT NULL, "
+            f"{'audio' if audio else 'NULL'} FROM places WHERE {where} "
+            f"ORDER BY CAST(lat / {poi_index.TILE_DEG} AS INTEGER), CAST(lon / {poi_index.TILE_DEG} AS INTEGER)"
+        )
+        for osm_type, osm_id, name, lat, lon, tags, article, story, narrated, audio_data in rows:
+            place = {'osm_type': osm_type, 'osm_id': osm_id, 'name': name, 'lat': lat, 'lon': lon,
+                     'tags': json.loads(tags), 'article': json.loads(article) if article else None,
+                     'story': story, 'narrated': bool(narrated), 'audio': audio_data}
+            kind = poi_index.place_type(place['tags'])
+            if kind:
+                place['type'] = kind
+            yield place
+
+    def unchecked(self):
+        """Places not yet looked up on Wikipedia"""
+        with self._lock:
+            return list(self._places("checked = 0"))
+
+    def unfinished(self, narrate):
+        """Places with an article still missing their story, or their audio if narrating"""
+        with self._lock:
+            return list(self._places("article IS NOT NULL AND (story IS NULL" + (" OR audio IS NULL)" if narrate else ")")))
+
+    def finished(self, narrate):
+        """Places ready to pack, with their MP3s, read one at a time"""
+        return self._places("story IS NOT NULL" + (" AND audio IS NOT NULL" if narrate else ""), audio=narrate)
+
+    def save(self, place, **fields):
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        self._update(
+            f"UPDATE places SET {columns} WHERE osm_type = ? AND osm_id = ?",
+            (*fields.values(), place['osm_type'], place['osm_id'])
+        )
+
+    def remove(self):
+        self._db.close()
+        os.remove(self.path)
+
+    def counts(self):
+        return dict(zip(
+            ('places', 'checked', 'articles', 'stories', 'narrated', 'errors'),
+            self._query(
+                "SELECT COUNT(*), SUM(checked), COUNT(article), COUNT(story), COUNT(audio), COUNT(error) FROM places"
+            )[0]
+        ))
+
+
+def snap_to_tiles(bbox):
+    """The smallest box of whole grid tiles containing bbox"""
+    south, west, _, _ = poi_index.tile_bbox(poi_index.tile_of(bbox[0], bbox[1]))
+    _, _, north, east = poi_index.tile_bbox(poi_index.tile_of(bbox[2], bbox[3]))
+    return south, west, north, east
+
+
+def areas_in(bbox):
+    """Blocks of AREA_TILES x AREA_TILES grid tiles covering a box, keyed by their first tile"""
+    first_row, first_col = poi_index.tile_of(bbox[0], bbox[1])
+    last_row, last_col = poi_index.tile_of(bbox[2], bbox[3])
+    for row in range(first_row, last_row + 1, AREA_TILES):
+        for col in range(first_col, last_col + 1, AREA_TILES):
+            tiles = [
+                (r, c)
+                for r in range(row, min(row + AREA_TILES, last_row + 1))
+                for c in range(col, min(col + AREA_TILES, last_col + 1))
+            ]
+            yield (row, col), tiles
+
+
+def fetch_areas(checkpoint, bbox, limiter):
+    """Fetch candidate places area by area; Overpass is asked one request at a time"""
+    for area, tiles in areas_in(bbox):
+        if checkpoint.has_area(area):
+            continue
+        limiter.wait()
+        try:
+            by_tile = places.fetch_tile_elements(tiles)
+        except Exception as e:
+            print(f"  Overpass failed for area {area}: {e}")
+            continue
+        checkpoint.add_area(area, [element for elements in by_tile.values() for element in elements], snap_to_tiles(bbox))
+
+
+def check_articles(checkpoint, limiter, workers):
+    """Verify Wikipedia articles in batches of nearby places"""
+    pending = checkpoint.unchecked()
+    batches = [pending[i:i + places.VERIFY_BATCH_SIZE] for i in range(0, len(pending), places.VERIFY_BATCH_SIZE)]
+
+    def check(batch):
+        center = (sum(place['lat'] for place in batch) / len(batch), sum(place['lon'] for place in batch) / len(batch))
+        radius = max(poi_index.haversine_m(*center, place['lat'], place['lon']) for place in batch) + 100
+        limiter.wait()
+        articles = places.verify_wikipedia_articles(
+            [(place['name'], (place['lat'], place['lon']), place['tags']) for place in batch],
+            center=center,
+            radius=radius
+        )
+        for place, article in zip(batch, articles):
+            if article:
+                checkpoint.save(place, checked=1, article=json.dumps(article), error=None)
+            elif wiki_misses.get(place_key(place['name'], (place['lat'], place['lon']))):
+                checkpoint.save(place, checked=1, error=None)
+            else:
+                checkpoint.save(place, error="Wikipedia lookup failed")  # Retried on the next run
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(check, batches))
+
+
+def write_stories(checkpoint, narrate, output_format, story_limiter, audio_limiter, workers):
+    """Write and narrate the story of every place with an article"""
+    def tell(place):
+        try:
+            story = place['story']
+            if not story:
+                if not narrative.get_cached_story(place['article'], place):
+                    story_limiter.wait()
+                story = narrative.generate_story(place['article'], place)
+                if not story:
+                    raise ValueError("the story came back empty")
+                checkpoint.save(place, story=story, error=None)
+
+            if narrate and not place['narrated']:
+                if not narration.get_cached_audio(story, output_format):
+                    audio_limiter.wait()
+                path = narration.synthesize_audio(story, output_format=output_format)
+                with open(path, 'rb') as f:
+                    checkpoint.save(place, audio=f.read(), error=None)
+        except Exception as e:
+            checkpoint.save(place, error=f"{type(e).__name__}: {e}")  # Retried on the next run
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(tell, checkpoint.unfinished(narrate)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('bbox', type=parse_bbox, help="area to pack (south,west,north,east)")
+    parser.add_argument('--output', default=city_pack.CITY_PACK_PATH, help="pack file to write")
+    parser.add_argument('--workers', type=int, default=4, help="places processed in parallel")
+    parser.add_argument('--overpass-rate', type=float, default=0.2, help="Overpass requests per second")
+    parser.add_argument('--wiki-rate', type=float, default=2, help="Wikipedia batches per second")
+    parser.add_argument('--story-rate', type=float, default=1, help="story completions per second")
+    parser.add_argument('--audio-rate', type=float, default=1, help="narrations per second")
+    parser.add_argument('--audio-format', choices=AUDIO_FORMATS, default='standard', help="narration quality")
+    parser.add_argument('--no-audio', action='store_true', help="pack story text only")
+    args = parser.parse_args()
+
+    # Build from the live pipeline, not from a pack that is already installed
+    city_pack.use_pack(None)
+    bounds = snap_to_tiles(args.bbox)
+    narrate = not args.no_audio
+    output_format = AUDIO_FORMATS[args.audio_format]
+    checkpoint = Checkpoint(args.output + ".partial", args.bbox)
+    started = time.perf_counter()
+
+    print("Fetching places...")
+    fetch_areas(checkpoint, args.bbox, RateLimiter(args.overpass_rate))
+    print("Checking Wikipedia articles...")
+    check_articles(checkpoint, RateLimiter(args.wiki_rate), args.workers)
+    print("Writing stories" + (" and narration..." if narrate else "..."))
+    write_stories(checkpoint, narrate, output_format, RateLimiter(args.story_rate), RateLimiter(args.audio_rate),
+                  args.workers)
+
+    counts = checkpoint.counts()
+    count = city_pack.write_pack(
+        args.output, checkpoint.finished(narrate), bounds, source=f"overpass {','.join(str(v) for v in args.bbox)}",
+        story_model=narrative.STORY_MODEL, prompt_version=narrative.PROMPT_VERSION,
+        voice_id=narration.VOICE_ID, tts_model=narration.TTS_MODEL_ID,
+        audio_format=output_format if narrate else ""
+    )
+    print(f"{counts['places']} places, {counts['articles']} with articles, {counts['stories']} stories, "
+          f"{counts['narrated']} narrated; packed {count} into {args.output} "
+          f"({os.path.getsize(args.output) / 1024:.0f} KiB) in {time.perf_counter() - started:.1f}s")
+
+    incomplete = len(list(areas_in(args.bbox))) - checkpoint.area_count()
+    if counts['errors'] or incomplete:
+        print(f"{counts['errors']} places and {incomplete} areas failed; run the same command again to retry them")
+    else:
+        checkpoint.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Build the local POI index used by get_nearby_places.
+
+Takes either an OSM extract (.osm.pbf, .osm, .osm.bz2; needs the optional
+`osmium` package) or an Overpass JSON dump, keeps the same notable places the
+live Overpass query would return, and writes a SQLite/R*Tree index.
+
+    python -m tools.build_poi_index greater-london-latest.osm.pbf
+    python -m tools.build_poi_index dump.json --bbox 51.28,-0.51,51.69,0.33
+
+To get an Overpass dump for a bounding box, print the matching query and post
+it to an Overpass server:
+
+    python -m tools.build_poi_index --print-query 51.28,-0.51,51.69,0.33
+"""
+import argparse
+import json
+import sys
+import time
+
+from steepd import poi_index
+
+
+def parse_bbox(value):
+    """Parse "south,west,north,east" into a tuple of floats"""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("expected south,west,north,east")
+    return tuple(parts)
+
+
+def data_bounds(elements):
+    """Bounding box of the element coordinates"""
+    lats, lons = [], []
+    for element in elements:
+        point = element if 'lat' in element else element.get('center')
+        if point:
+            lats.append(point['lat'])
+            lons.append(point['lon'])
+    if not lats:
+        return None
+    return min(lats), min(lons), max(lats), max(lons)
+
+
+def read_overpass_json(path):
+    """Load elements from an Overpass JSON dump"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('elements', []), None
+
+
+def read_osm_extract(path):
+    """Load candidate elements from an OSM extract with pyosmium
+
+    Way and area centres are bounding-box centres, matching Overpass "out center".
+    """
+    try:
+        import osmium
+    except ImportError:
+        sys.exit("Reading OSM extracts needs the osmium package: pip install osmium")
+
+    keys = sorted({key for _, key, _ in poi_index.POI_FILTERS})
+    processor = (
+        osmium.FileProcessor(path)
+        .with_locations()
+        .with_areas(osmium.filter.KeyFilter(*keys))
+        .with_filter(osmium.filter.KeyFilter('name'))
+        .with_filter(osmium.filter.KeyFilter(*keys))
+    )
+
+    header_box = processor.header.box()
+    bounds = None
+    if header_box.valid():
+        bounds = (header_box.bottom_left.lat, header_box.bottom_left.lon,
+                  header_box.top_right.lat, header_box.top_right.lon)
+
+    elements = []
+    for obj in processor:
+        tags = dict(obj.tags)
+        if obj.is_node():
+            elements.append({'type': 'node', 'id': obj.id, 'lat': obj.location.lat,
+                             'lon': obj.location.lon, 'tags': tags})
+        elif obj.is_way():
+            locations = [node.location for node in obj.nodes if node.location.valid()]
+            if locations:
+                elements.append({'type': 'way', 'id': obj.id, 'center': _box_center(locations), 'tags': tags})
+        elif obj.is_area() and not obj.from_way():
+            # Multipolygon relations arrive as assembled areas
+            locations = [node.location for ring in obj.outer_rings() for node in ring]
+            if locations:
+                elements.append({'type': 'relation', 'id': obj.orig_id(), 'center': _box_center(locations),
+                                 'tags': tags})
+    return elements, bounds
+
+
+def _box_center(locations):
+    lats = [location.lat for location in locations]
+    lons = [location.lon for location in locations]
+    return {'lat': (min(lats) + max(lats)) / 2, 'lon': (min(lons) + max(lons)) / 2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', help="OSM extract or Overpass JSON dump")
+    parser.add_argument('--output', default=poi_index.POI_INDEX_PATH, help="index file to write")
+    parser.add_argument('--bbox', type=parse_bbox,
+                        help="area the source covers (south,west,north,east); defaults to the file header "
+                             "or the extent of the data")
+    parser.add_argument('--print-query', type=parse_bbox, metavar='BBOX',
+                        help="print the Overpass query for a bounding box and exit")
+    args = parser.parse_args()
+
+    if args.print_query:
+        print(poi_index.overpass_query(",".join(str(v) for v in args.print_query)))
+        return
+    if not args.source:
+        parser.error("a source file is required")
+
+    started = time.perf_counter()
+    if args.source.endswith('.json'):
+        elements, bounds = read_overpass_json(args.source)
+    else:
+        elements, bounds = read_osm_extract(args.source)
+
+    bounds = args.bbox or bounds or data_bounds(elements)
+    if not bounds:
+        sys.exit("No places found and no --bbox given")
+
+    count = poi_index.create_index(args.output, elements, bounds, source=args.source)
+    print(f"Indexed {count} places from {len(elements)} elements into {args.output} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
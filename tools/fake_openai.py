@@ -0,0 +1,121 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Serves canned stories so the narrative code can be exercised offline, in both
+streaming and non-streaming modes. Point the app at it with
+
+    OPENAI_BASE_URL = "http://127.0.0.1:8001/v1"
+
+in .streamlit/secrets.toml, then run
+
+    python tools/fake_openai.py --port 8001 --token-delay 0.02
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STORY = (
+    "Stand here for a moment and look up. The building in front of you has watched "
+    "this street change for centuries. Merchants, poets and the occasional scoundrel "
+    "have all passed by exactly where you are standing now, and each left a little "
+    "of their story behind."
+)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive, like the real API
+    protocol_version = 'HTTP/1.1'
+    token_delay = 0.0
+    first_token_delay = 0.0
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        model = body.get('model', 'gpt-4')
+
+        time.sleep(self.first_token_delay)
+        if body.get('stream'):
+            self._stream(model)
+        else:
+            self._complete(model)
+
+    def _complete(self, model):
+        payload = {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': STORY},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        words = STORY.split(' ')
+        for i, word in enumerate(words):
+            delta = {'content': word if i == 0 else ' ' + word}
+            if i == 0:
+                delta['role'] = 'assistant'
+            self._send_event(model, delta, None)
+            time.sleep(self.token_delay)
+
+        self._send_event(model, {}, 'stop')
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def _send_event(self, model, delta, finish_reason):
+        chunk = {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+        }
+        self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+
+    def _write_chunk(self, data):
+        """Write one piece of a chunked response; an empty piece ends it"""
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--first-token-delay', type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.02, help="seconds between streamed tokens")
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.first_token_delay = args.first_token_delay
+    FakeOpenAIHandler.token_delay = args.token_delay
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenAIHandler)
+    print(f"Fake OpenAI endpoint on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
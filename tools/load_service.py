@@ -0,0 +1,151 @@
+"""Load test: the headless HTTP service (steepd/service.py) against local stubs.
+
+Starts the stand-in upstreams from tools/stub_upstreams.py and the service on
+a local port, then sends bursts of concurrent clients:
+
+  nearby  every client asks for places around the same corpus points
+  story   every client asks for the story of the same few places at once
+  audio   every client downloads the narration it was given
+
+Reports latency per phase, requests received by each upstream, and how many
+requests were coalesced onto a generation already in flight.
+
+    python -m tools.load_service --clients 20 --places 3 --latency openai=1.5
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+from tools.bench_pipeline import CORPUS, _percentiles
+from tools.stub_upstreams import StubUpstreams, parse_latency
+
+STARTUP_TIMEOUT = 10  # seconds
+
+
+def start_service(stubs, workdir, port, nominatim_interval):
+    """Import the service against the stubs, with caches in workdir, and serve it on a thread"""
+    os.environ.update(stubs.env())
+    os.environ.update(stubs.secrets())  # the service reads API keys and base URLs from the environment
+    os.environ.update({
+        'STEEPD_GEOCODE_DB': os.path.join(workdir, 'geocode.sqlite3'),
+        'STEEPD_ARTIFACT_DIR': os.path.join(workdir, 'artifacts'),
+        'STEEPD_TRACE_FILE': os.path.join(workdir, 'traces.jsonl'),
+        'STEEPD_POI_INDEX': os.path.join(workdir, 'no_poi_index.sqlite3')
+    })
+
+    service = importlib.import_module('steepd.service')
+    if nominatim_interval is not None:
+        importlib.import_module('steepd.geocoding').NOMINATIM_MIN_INTERVAL = nominatim_interval
+
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(service.app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("service did not start")
+        time.sleep(0.05)
+    return server
+
+
+async def _timed_get(client, url, timings, phase, **params):
+    start = time.perf_counter()
+    response = await client.get(url, params=params or None)
+    timings[phase].append(time.perf_counter() - start)
+    return response
+
+
+async def run(base_url, clients, stories_per_point):
+    timings = defaultdict(list)
+    statuses = defaultdict(int)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        # Every client asks about the same points at the same time
+        story_urls = []
+        for area, points in CORPUS.items():
+            for name, lat, lon in points:
+                responses = await asyncio.gather(*[
+                    _timed_get(client, '/nearby', timings, f'nearby {area}', lat=lat, lon=lon)
+                    for _ in range(clients)
+                ])
+                for response in responses:
+                    statuses[f'nearby {response.status_code}'] += 1
+                found = responses[0].json().get('places', []) if responses[0].status_code == 200 else []
+                story_urls.extend(place['story_url'] for place in found[:stories_per_point])
+                print(f"  nearby {area:<7} {name:<18} {len(found)} places", file=sys.stderr)
+
+        # Then the same stories, all clients at once per place
+        audio_urls = []
+        for url in story_urls:
+            responses = await asyncio.gather(*[_timed_get(client, url, timings, 'story') for _ in range(clients)])
+            for response in responses:
+                statuses[f'story {response.status_code}'] += 1
+                if response.status_code == 200 and response.json()['audio_url']:
+                    audio_urls.append(response.json()['audio_url'])
+
+        await asyncio.gather(*[_timed_get(client, url, timings, 'audio') for url in audio_urls])
+
+        stats = (await client.get('/stats')).json()
+
+    return timings, dict(statuses), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=20, help="concurrent clients per request")
+    parser.add_argument('--places', type=int, default=1, help="stories requested per corpus point")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', action='append', metavar='UPSTREAM=SECONDS',
+                        help="injected latency per upstream (repeatable)")
+    parser.add_argument('--nominatim-interval', type=float, default=None,
+                        help="override the Nominatim rate limit (seconds between requests)")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    # steepd lives in the repository root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    with StubUpstreams(parse_latency(args.latency)) as stubs, tempfile.TemporaryDirectory() as workdir:
+        server = start_service(stubs, workdir, args.port, args.nominatim_interval)
+        try:
+            timings, statuses, stats = asyncio.run(run(f"http://127.0.0.1:{args.port}", args.clients, args.places))
+        finally:
+            server.should_exit = True
+        upstream_requests = stubs.counts.snapshot()
+
+    latency = {phase: _percentiles(values) for phase, values in timings.items()}
+    print(f"\nLatency with {args.clients} concurrent clients")
+    print(f"  {'phase':<16} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for phase, row in latency.items():
+        print(f"  {phase:<16} {row['n']:>5} {row['p50_ms']:>10} {row['p95_ms']:>10} {row['max_ms']:>10}")
+
+    print(f"\nResponses: {statuses}")
+    print("Requests received by each upstream: " + "  ".join(f"{key}={value}" for key, value in upstream_requests.items()))
+    coalescing = stats['coalescing']
+    print(f"Coalescing: {coalescing['calls']} generations served "
+          f"{coalescing['calls'] + coalescing['coalesced']} requests ({coalescing['coalesced']} joined one in flight)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'clients': args.clients,
+                'latency': latency,
+                'responses': statuses,
+                'requests': upstream_requests,
+                'service': stats,
+                'latency_injected': stubs.latency
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
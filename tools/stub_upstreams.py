@@ -0,0 +1,402 @@
+"""Local stand-ins for every upstream API, with injected latency.
+
+Overpass, Nominatim, Wikipedia/Wikidata, OpenAI and ElevenLabs each get a
+small HTTP server on localhost serving deterministic synthetic data. Place
+density falls off with distance from central London, so the centre is dense,
+the suburbs thinner and outlying areas sparse. The same coordinates always
+produce the same places, tags and articles.
+
+Used by tools/bench_pipeline.py; run on its own to try the app offline:
+
+    python -m tools.stub_upstreams --latency overpass=0.8 --latency openai=0.5
+
+It prints the environment variables and secrets that point the app at the stubs.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from tools.fake_openai import FakeOpenAIHandler
+
+UPSTREAMS = ('overpass', 'nominatim', 'wikipedia', 'openai', 'elevenlabs')
+
+# Seconds added before each response; OpenAI's is the wait for the first token
+DEFAULT_LATENCY = {
+    'overpass': 0.8,
+    'nominatim': 0.15,
+    'wikipedia': 0.12,
+    'openai': 0.6,
+    'elevenlabs': 0.8
+}
+OPENAI_TOKEN_DELAY = 0.01  # seconds between streamed tokens
+ELEVENLABS_SECONDS_PER_CHAR = 0.002  # rendering time on top of the base latency
+AUDIO_BYTES_PER_CHAR = 1000  # ~15 characters per second of speech at 128 kbps
+
+CITY_CENTRE = (51.5080, -0.1281)
+CELL_DEG = 0.002  # synthetic places are generated per grid cell of this size
+CENTRE_PLACES_PER_CELL = 5.0
+DENSITY_FALLOFF_KM = 5.0  # density drops by e every this many km from the centre
+AREA_CELL_DEG = 0.02  # Nominatim suburbs are this coarse
+
+KINDS = [
+    ('Church', {'amenity': 'place_of_worship', 'building': 'church'}),
+    ('Memorial', {'historic': 'memorial'}),
+    ('Statue', {'historic': 'memorial', 'memorial': 'statue'}),
+    ('Gardens', {'leisure': 'garden'}),
+    ('Theatre', {'amenity': 'theatre'}),
+    ('Library', {'amenity': 'library'}),
+    ('Museum', {'tourism': 'museum'}),
+    ('House', {'historic': 'building'}),
+    ('Tesco Express', {'tourism': 'information'}),  # dropped by the chain filter
+]
+NAME_WORDS = ['St Mary', 'Victoria', 'Albert', 'Queen Anne', 'Wellington', 'Nelson', 'Grosvenor', 'Kings',
+              'Holland', 'Bedford', 'Cromwell', 'Dickens', 'Fleming', 'Wren', 'Turner', 'Brunel']
+SUBURBS = ['Soho', 'Covent Garden', 'Bloomsbury', 'Clerkenwell', 'Southwark', 'Lambeth', 'Chelsea',
+           'Islington', 'Hackney', 'Camden', 'Brixton', 'Greenwich', 'Ealing', 'Walthamstow']
+
+TAGGED_SUFFIX = " (landmark)"  # titles from wikipedia/wikidata tags, which always exist
+ARTICLE_SHARE = 40  # percent of guessed titles that exist
+
+_AROUND = re.compile(r'\(around:([\d.]+),(-?[\d.]+),(-?[\d.]+)\)')
+_BBOX = re.compile(r'\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)')
+
+
+def _seed(*parts):
+    return zlib.crc32(":".join(str(part) for part in parts).encode('utf-8'))
+
+
+def _distance_km(lat, lon, to_lat, to_lon):
+    dy = (to_lat - lat) * 111.2
+    dx = (to_lon - lon) * 111.2 * math.cos(math.radians(lat))
+    return math.hypot(dx, dy)
+
+
+def cell_places(i, j):
+    """The synthetic OSM elements in grid cell (i, j)"""
+    lat, lon = i * CELL_DEG, j * CELL_DEG
+    rng = random.Random(_seed('cell', i, j))
+    density = CENTRE_PLACES_PER_CELL * math.exp(-_distance_km(lat, lon, *CITY_CENTRE) / DENSITY_FALLOFF_KM)
+    count = int(density + rng.random())
+
+    elements = []
+    for k in range(count):
+        kind, kind_tags = rng.choice(KINDS)
+        name = f"{rng.choice(NAME_WORDS)} {kind}" if kind != 'Tesco Express' else kind
+        element_id = _seed('element', i, j, k)
+        tags = dict(kind_tags, name=name)
+
+        # Roughly a third of places carry a wikipedia tag and a quarter a wikidata one
+        roll = rng.random()
+        if roll < 0.33:
+            tags['wikipedia'] = f"en:{name}{TAGGED_SUFFIX}"
+        elif roll < 0.58:
+            tags['wikidata'] = f"Q{element_id % 10_000_000}"
+
+        point = {'lat': lat + rng.random() * CELL_DEG, 'lon': lon + rng.random() * CELL_DEG}
+        element = {'type': 'node', 'id': element_id, 'tags': tags}
+        if k % 3:
+            element.update(point)
+        else:
+            element.update(type='way', center=point)
+        elements.append(element)
+    return elements
+
+
+def places_in_bbox(south, west, north, east):
+    """Synthetic elements whose position falls inside a bounding box"""
+    elements = []
+    for i in range(math.floor(south / CELL_DEG), math.floor(north / CELL_DEG) + 1):
+        for j in range(math.floor(west / CELL_DEG), math.floor(east / CELL_DEG) + 1):
+            for element in cell_places(i, j):
+                point = element.get('center', element)
+                if south <= point['lat'] <= north and west <= point['lon'] <= east:
+                    elements.append(element)
+    return elements
+
+
+def places_around(lat, lon, radius):
+    """Synthetic elements within radius metres of a point"""
+    dlat = radius / 111_200
+    dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+    return [
+        element for element in places_in_bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        if _distance_km(lat, lon, element.get('center', element)['lat'],
+                        element.get('center', element)['lon']) * 1000 <= radius
+    ]
+
+
+def suburb_of(lat, lon):
+    """Synthetic suburb name for a coordinate"""
+    cell = (math.floor(lat / AREA_CELL_DEG), math.floor(lon / AREA_CELL_DEG))
+    return SUBURBS[_seed('suburb', *cell) % len(SUBURBS)]
+
+
+def article_exists(title):
+    return title.endswith(TAGGED_SUFFIX) or _seed('article', title) % 100 < ARTICLE_SHARE
+
+
+def article_extract(title):
+    """Intro text that passes the app's location and artwork checks"""
+    name = title.split(',')[0].replace(TAGGED_SUFFIX, '')
+    sentences = [
+        f"{name} is a historic landmark in London, England.",
+        "The bronze statue and stone memorial nearby were unveiled in the nineteenth century.",
+        "Local historians have written about it for generations, and it remains a favourite stop on walking tours."
+    ]
+    return " ".join(sentences * 4)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Base for the stub servers: keep-alive, injected latency and request counting"""
+    protocol_version = 'HTTP/1.1'
+    upstream = None
+    latency = 0.0
+    counts = None
+
+    def _begin(self):
+        self.counts.record(self.upstream)
+        time.sleep(self.latency)
+
+    def _query(self):
+        return {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OverpassHandler(StubHandler):
+    upstream = 'overpass'
+
+    def do_GET(self):
+        self._begin()
+        query = self._query().get('data', '')
+
+        elements = {}
+        for radius, lat, lon in _AROUND.findall(query):
+            for element in places_around(float(lat), float(lon), float(radius)):
+                elements[element['id']] = element
+        for bbox in set(_BBOX.findall(query)):
+            for element in places_in_bbox(*(float(value) for value in bbox)):
+                elements[element['id']] = element
+
+        self._send_json({'version': 0.6, 'elements': list(elements.values())})
+
+
+class NominatimHandler(StubHandler):
+    upstream = 'nominatim'
+
+    def do_GET(self):
+        self._begin()
+        query = self._query()
+        lat, lon = float(query['lat']), float(query['lon'])
+        suburb = suburb_of(lat, lon)
+        self._send_json({
+            'lat': str(lat),
+            'lon': str(lon),
+            'display_name': f"{suburb}, London, England",
+            'address': {'suburb': suburb, 'city': 'London', 'country': 'United Kingdom'}
+        })
+
+
+class WikipediaHandler(StubHandler):
+    """MediaWiki query API (titles and geosearch) and Wikidata wbgetentities"""
+    upstream = 'wikipedia'
+
+    def do_GET(self):
+        self._begin()
+        query = self._query()
+
+        if query.get('action') == 'wbgetentities':
+            entities = {
+                item: {'id': item, 'sitelinks': {'enwiki': {'site': 'enwiki', 'title': f"{item}{TAGGED_SUFFIX}"}}}
+                for item in query.get('ids', '').split('|') if item
+            }
+            self._send_json({'entities': entities})
+        elif query.get('list') == 'geosearch':
+            lat, lon = (float(value) for value in query['gscoord'].split('|'))
+            pages = [
+                {'title': element['tags']['wikipedia'][3:], 'lat': point['lat'], 'lon': point['lon']}
+                for element in places_around(lat, lon, float(query.get('gsradius', 1000)))
+                for point in [element.get('center', element)]
+                if 'wikipedia' in element['tags']
+            ]
+            self._send_json({'query': {'geosearch': pages[:int(query.get('gslimit', 100))]}})
+        else:
+            pages = [
+                {'title': title, 'extract': article_extract(title), 'fullurl': f"https://en.wikipedia.org/wiki/{title}",
+                 'lastrevid': _seed('revision', title)}
+                if article_exists(title) else {'title': title, 'missing': True}
+                for title in query.get('titles', '').split('|') if title
+            ]
+            self._send_json({'query': {'pages': pages}})
+
+
+class ElevenLabsHandler(StubHandler):
+    upstream = 'elevenlabs'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        text = json.loads(self.rfile.read(length) or b'{}').get('text', '')
+        self._begin()
+        time.sleep(len(text) * ELEVENLABS_SECONDS_PER_CHAR)
+
+        data = b'ID3' + bytes(len(text) * AUDIO_BYTES_PER_CHAR)
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubOpenAIHandler(FakeOpenAIHandler):
+    upstream = 'openai'
+    counts = None
+
+    def do_POST(self):
+        self.counts.record(self.upstream)
+        super().do_POST()
+
+
+HANDLERS = {
+    'overpass': OverpassHandler,
+    'nominatim': NominatimHandler,
+    'wikipedia': WikipediaHandler,
+    'openai': StubOpenAIHandler,
+    'elevenlabs': ElevenLabsHandler
+}
+
+
+class RequestCounts:
+    """Requests received per upstream"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def record(self, upstream):
+        with self._lock:
+            self._counts[upstream] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {upstream: self._counts[upstream] for upstream in UPSTREAMS}
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)  # Clients dropping idle keep-alive connections is normal
+
+
+class StubUpstreams:
+    """Start one stub server per upstream on free localhost ports
+
+    Use as a context manager; env() and secrets() give the settings that point
+    the app at the stubs.
+    """
+
+    def __init__(self, latency=None, host='127.0.0.1'):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.host = host
+        self.counts = RequestCounts()
+        self.servers = {}
+
+    def start(self):
+        for upstream, handler in HANDLERS.items():
+            attributes = {'counts': self.counts}
+            if upstream == 'openai':
+                attributes.update(first_token_delay=self.latency['openai'], token_delay=OPENAI_TOKEN_DELAY)
+            else:
+                attributes['latency'] = self.latency[upstream]
+            server = StubServer((self.host, 0), type(handler.__name__, (handler,), attributes))
+            threading.Thread(target=server.serve_forever, name=f"stub-{upstream}", daemon=True).start()
+            self.servers[upstream] = server
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def url(self, upstream):
+        return f"http://{self.host}:{self.servers[upstream].server_address[1]}"
+
+    def env(self):
+        """Environment variables for the upstreams configured that way"""
+        return {
+            'STEEPD_OVERPASS_URL': f"{self.url('overpass')}/api/interpreter",
+            'STEEPD_NOMINATIM_DOMAIN': self.url('nominatim').split('://', 1)[1],
+            'STEEPD_NOMINATIM_SCHEME': 'http',
+            'STEEPD_WIKIPEDIA_API_URL': f"{self.url('wikipedia')}/w/api.php",
+            'STEEPD_WIKIDATA_API_URL': f"{self.url('wikipedia')}/w/api.php"
+        }
+
+    def secrets(self):
+        """Streamlit secrets for the upstreams configured that way"""
+        return {
+            'OPENAI_API_KEY': 'stub',
+            'OPENAI_BASE_URL': f"{self.url('openai')}/v1",
+            'ELEVENLABS_API_KEY': 'stub',
+            'ELEVENLABS_BASE_URL': self.url('elevenlabs')
+        }
+
+
+def parse_latency(values):
+    """Turn ["overpass=0.8", ...] into {'overpass': 0.8, ...}"""
+    latency = {}
+    for value in values or []:
+        upstream, _, seconds = value.partition('=')
+        if upstream not in UPSTREAMS:
+            raise argparse.ArgumentTypeError(f"unknown upstream {upstream!r}; expected one of {', '.join(UPSTREAMS)}")
+        latency[upstream] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', action='append', metavar='UPSTREAM=SECONDS',
+                        help="injected latency per upstream (repeatable)")
+    args = parser.parse_args()
+
+    with StubUpstreams(parse_latency(args.latency)) as stubs:
+        print("# Environment")
+        for key, value in stubs.env().items():
+            print(f"export {key}={value}")
+        print("\n# .streamlit/secrets.toml")
+        for key, value in stubs.secrets().items():
+            print(f'{key} = "{value}"')
+
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()